@@ -0,0 +1,25 @@
+"""Blockly Games: App Engine Configuration
+
+Copyright 2026 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+"""Hooks that App Engine calls when it loads the app.
+"""
+
+
+def webapp_add_wsgi_middleware(app):
+  # Log the cost of every request, see instrument.py.
+  import instrument
+  return instrument.Middleware(app)
@@ -64,12 +64,19 @@ if (location.host === 'blockly-games.appspot.com') {
     // Don't even think of throwing an error.
   }
 
+  // Content-named copies of the app's generated files, if any.
+  // Set by the copy of this script that build/fingerprint.py writes.
+  var assets = window['BlocklyGamesAssets'] || {};
+  function generated(file) {
+    return appName + '/generated/' + (assets[file] || file);
+  }
+
   // Load the chosen language pack.
   var script = document.createElement('script');
   if (debug) {
     script.src = 'generated/msg/' + lang + '.js';
   } else {
-    script.src = appName + '/generated/msg/' + lang + '.js';
+    script.src = generated('msg/' + lang + '.js');
   }
   script.type = 'text/javascript';
   document.head.appendChild(script);
@@ -78,7 +85,7 @@ if (location.host === 'blockly-games.appspot.com') {
   if (debug) {
     script.src = appName + '/generated/uncompressed.js';
   } else {
-    script.src = appName + '/generated/compressed.js';
+    script.src = generated('compressed.js');
   }
   script.type = 'text/javascript';
   document.head.appendChild(script);
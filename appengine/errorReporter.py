@@ -20,15 +20,18 @@ limitations under the License.
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
-import cgi
 import logging
+import webapp2
 
 
-if __name__ == "__main__":
-  print("Content-Type: text/plain\n")
-  forms = cgi.FieldStorage()
-  if ("error" in forms) and ("url" in forms):
-    logging.error(forms["error"].value + '\nURL: ' + forms["url"].value)
-    print("Error logged.")
-  else:
-    print("Missing 'error' or 'url' param.")
+class ErrorReporterHandler(webapp2.RequestHandler):
+  def post(self):
+    self.response.headers["Content-Type"] = "text/plain"
+    params = self.request.params
+    if ("error" in params) and ("url" in params):
+      logging.error(params["error"] + '\nURL: ' + params["url"])
+      self.response.write("Error logged.\n")
+    else:
+      self.response.write("Missing 'error' or 'url' param.\n")
+
+  get = post
@@ -37,7 +37,7 @@ ${BlocklyGames.html.headerBar(ij, appName, '', false, false, '')}
  * One record.
  * @param {string} app Application this record belongs to (turtle/movie/music)
  * @param {string} uuid Unique datastore key for the code (stored separately).
- * @param {string} thumb Base 64-encoded thumbnail.
+ * @param {string} thumb URL of thumbnail image.
  * @param {string} title User-provided title.
  * @param {boolean} published Is the record published?
  * @param {string} key Unique datastore key for this record.
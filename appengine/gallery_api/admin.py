@@ -20,21 +20,25 @@ limitations under the License.
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
-import cgi
+import webapp2
 from gallery_api import *
 
 
-print("Content-Type: text/plain\n")
-forms = cgi.FieldStorage()
-record_id = int(forms["key"].value)
-public = (forms["public"].value == "1")
-art = Art.get_by_id(record_id)
-if art.public == public:
-  print("No change to %s." % record_id)
-else:
-  art.public = public
-  art.put()
-  if public:
-    print("Published %s." % record_id)
-  else:
-    print("Unpublished %s." % record_id)
+class AdminHandler(webapp2.RequestHandler):
+  def post(self):
+    self.response.headers["Content-Type"] = "text/plain"
+    record_id = int(self.request.params["key"])
+    public = (self.request.params["public"] == "1")
+    art = Art.get_by_id(record_id)
+    if art.public == public:
+      self.response.write("No change to %s.\n" % record_id)
+    else:
+      art.public = public
+      art.put()
+      flushFirstPage(art.app)
+      if public:
+        self.response.write("Published %s.\n" % record_id)
+      else:
+        self.response.write("Unpublished %s.\n" % record_id)
+
+  get = post
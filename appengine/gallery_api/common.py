@@ -15,13 +15,27 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-"""Gallery's datastore models.  Shared by admin, submit, and view.
+"""Gallery's datastore models and caches.  Shared by admin, submit, and view.
 """
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
+import base64
+import re
+from google.appengine.api import memcache
 from google.appengine.ext import ndb
 
+# Memcache prefix for each app's serialized first page of public art.
+FIRST_PAGE_PREFIX = "GALLERY_FIRST_PAGE_"
+# Seconds to keep a first page cached.
+FIRST_PAGE_TIME = 24 * 60 * 60
+# Seconds after a flush during which a stale first page can't be re-added.
+FIRST_PAGE_LOCK = 10
+# MIME types of the thumbnails that may be submitted and served.
+THUMB_TYPES = ("image/png", "image/jpeg", "image/gif")
+# Matches the data of a base64 "data:" URL.
+BASE64_REGEX = re.compile(r"^[A-Za-z0-9+/]*={0,2}$")
+
 
 class Art(ndb.Model):
   """Models a user-supplied work of art."""
@@ -31,3 +45,37 @@ class Art(ndb.Model):
   title = ndb.TextProperty()
   public = ndb.BooleanProperty()
   created = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class Thumb(ndb.Model):
+  """Models the thumbnail of a work of art.  Shares its Art's integer id."""
+  mime = ndb.StringProperty(indexed=False)
+  image = ndb.BlobProperty()
+
+
+def flushFirstPage(app):
+  """Drop an app's cached first page after its public art has changed."""
+  memcache.delete(FIRST_PAGE_PREFIX + app, seconds=FIRST_PAGE_LOCK)
+
+
+def parseDataUrl(data_url):
+  """Split a base64 "data:" URL into its MIME type and decoded bytes.
+
+  Thumbnails are served from this site's own origin, so only image types
+  that can't hold script are accepted.  Raises ValueError for any other
+  type, or for data that isn't valid base64.
+  """
+  (header, sep, data) = data_url.partition(",")
+  params = header[len("data:"):].split(";")
+  if (not header.startswith("data:") or params[0] not in THUMB_TYPES or
+      "base64" not in params[1:]):
+    raise ValueError("Not a PNG, JPEG or GIF data URL.")
+  # b64decode skips any characters outside the alphabet, so check first.
+  if not data or not BASE64_REGEX.match(data) or len(data) % 4:
+    raise ValueError("Thumbnail is not valid base64.")
+  return (str(params[0]), base64.b64decode(data))
+
+
+def thumbUrl(record_id):
+  """URL of the thumbnail for the art with the given id."""
+  return "/gallery-api/thumb?key=%d" % record_id
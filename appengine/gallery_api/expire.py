@@ -21,23 +21,71 @@ limitations under the License.
 __author__ = "fraser@google.com (Neil Fraser)"
 
 import datetime
-import json
+import logging
+import time
+import webapp2
 from gallery_api import *
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+
+# Called by cron or an admin with no arguments, which only starts a task.
+# The task, and each continuation task it chains, is called with:
+# - cursor: Opaque pointer string (none for the first task).
+# - before: Cutoff timestamp of the run.
 
 # Number of rows per page.
 ROWS = 1024
 # Age in hours to delete non-public submissions.
 AGE = 1
+# Seconds to spend deleting before handing the rest to a new task.
+# Well under any request deadline, so the chain always continues.
+BUDGET = 30
+
+def addTask(bestBefore, curs):
+  """Queue a task to delete the records before a cutoff, from a cursor."""
+  before = (bestBefore - datetime.datetime(1970, 1, 1)).total_seconds()
+  params = {"before": before}
+  if curs:
+    params["cursor"] = curs.urlsafe()
+  taskqueue.add(url="/gallery-api/expire", method="GET", params=params)
 
-print("Content-Type: text/plain\n")
+class ExpireHandler(webapp2.RequestHandler):
+  def get(self):
+    self.response.headers["Content-Type"] = "text/plain"
+    start = time.time()
+    params = self.request.params
 
-bestBefore = datetime.datetime.now() - datetime.timedelta(hours=AGE)
-query = Art.query(Art.public == False, Art.created < bestBefore)
+    if "X-AppEngine-QueueName" not in self.request.headers:
+      # Tasks have a longer deadline than cron and browser requests.
+      bestBefore = datetime.datetime.now() - datetime.timedelta(hours=AGE)
+      addTask(bestBefore, None)
+      self.response.write("Deleting unpublished records submitted before %s"
+                          " in a task.\n" % bestBefore)
+      return
+    bestBefore = datetime.datetime.utcfromtimestamp(float(params["before"]))
+    if "cursor" in params:
+      curs = Cursor(urlsafe=params["cursor"])
+    else:
+      curs = None
+    query = Art.query(Art.public == False, Art.created < bestBefore)
 
-results = query.fetch(limit=ROWS)
+    self.response.write("Deleting unpublished records submitted before %s\n"
+        % bestBefore)
+    count = 0
+    more = True
+    while more and time.time() - start < BUDGET:
+      (keys, curs, more) = query.fetch_page(ROWS, start_cursor=curs,
+                                            keys_only=True)
+      thumbKeys = [ndb.Key(Thumb, key.integer_id()) for key in keys]
+      ndb.delete_multi(keys + thumbKeys)
+      count += len(keys)
 
-print("Deleting unpublished records submitted before %s" % bestBefore)
-for rec in results:
-  print("* %s" % rec.title).encode("utf-8")
-  rec.key.delete()
-print("Done.")
+    if more:
+      # Out of time, chain a task to drain the rest of the backlog.
+      addTask(bestBefore, curs)
+    report = "Deleted %d records in %.1f seconds." % (count, time.time() - start)
+    if more:
+      report += "  Continuing in a new task."
+    logging.info(report)
+    self.response.write(report + "\n")
+    self.response.write("Done.\n")
@@ -20,19 +20,40 @@ limitations under the License.
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
-import cgi
 import storage
+import webapp2
 from gallery_api import *
 
 
-print("Content-Type: text/plain\n")
-forms = cgi.FieldStorage()
-xml = forms["xml"].value
-uuid = storage.xmlToKey(xml)
-print("XML saved as %s." % uuid)
-app = forms["app"].value
-thumb = forms["thumb"].value
-title = forms["title"].value
-art = Art(uuid=uuid, app=app, thumb=thumb, title=title, public=False)
-art.put()
-print("Submitted to %s as %s." % (app, uuid))
+@ndb.tasklet
+def submitAsync(xml, app, thumb, title):
+  """Save the XML and its art, returning a future for the XML's key.
+
+  The future raises ValueError, and nothing is saved, if the thumbnail is
+  not an accepted image.
+  """
+  (mime, image) = parseDataUrl(thumb)
+  # The art's id doesn't depend on the XML's key, so reserve it meanwhile.
+  (uuid, (first, last)) = yield (storage.xmlToKeyAsync(xml),
+                                 Art.allocate_ids_async(1))
+  art = Art(id=first, uuid=uuid, app=app, title=title, public=False)
+  yield ndb.put_multi_async([art, Thumb(id=first, mime=mime, image=image)])
+  raise ndb.Return(uuid)
+
+
+class SubmitHandler(webapp2.RequestHandler):
+  def post(self):
+    self.response.headers["Content-Type"] = "text/plain"
+    params = self.request.params
+    app = params["app"]
+    try:
+      uuid = submitAsync(params["xml"], app, params["thumb"],
+                         params["title"]).get_result()
+    except ValueError as e:
+      self.response.set_status(400)
+      self.response.write("%s\n" % e)
+      return
+    self.response.write("XML saved as %s.\n" % uuid)
+    self.response.write("Submitted to %s as %s.\n" % (app, uuid))
+
+  get = post
@@ -0,0 +1,71 @@
+"""Blockly Games: Gallery
+
+Copyright 2026 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+"""Serve gallery thumbnails with App Engine.
+"""
+
+import hashlib
+import webapp2
+from gallery_api import *
+from google.appengine.api import users
+
+
+# Called with one argument:
+# - key: Integer id of the art.
+# Returns the thumbnail image.
+
+# Seconds that browsers and shared caches may serve a thumbnail without
+# asking again.  A thumbnail's image never changes, but unpublishing it must
+# take effect soon.  After this, the ETag makes checking again cheap.
+MAX_AGE = 60 * 60
+
+class ThumbHandler(webapp2.RequestHandler):
+  def get(self):
+    record_id = int(self.request.params["key"])
+    (art, thumb) = ndb.get_multi([ndb.Key(Art, record_id),
+                                  ndb.Key(Thumb, record_id)])
+    if not art:
+      self.response.set_status(404)
+      return
+    if art.public:
+      self.response.headers["Cache-Control"] = "public, max-age=%d" % MAX_AGE
+    elif users.is_current_user_admin():
+      self.response.headers["Cache-Control"] = "private, max-age=%d" % MAX_AGE
+    else:
+      self.response.set_status(404)
+      return
+
+    if thumb:
+      (mime, image) = (thumb.mime, thumb.image)
+    else:
+      # Art submitted before thumbnails were split out.
+      try:
+        (mime, image) = parseDataUrl(art.thumb or "")
+      except ValueError:
+        (mime, image) = (None, None)
+    # Never serve anything a browser could run as a page or script.
+    if mime not in THUMB_TYPES:
+      self.response.set_status(404)
+      return
+    self.response.headers["X-Content-Type-Options"] = "nosniff"
+    etag = hashlib.sha1(image).hexdigest()
+    self.response.etag = etag
+    if etag in self.request.if_none_match:
+      self.response.set_status(304)
+      return
+    self.response.headers["Content-Type"] = str(mime)
+    self.response.write(image)
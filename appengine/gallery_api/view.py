@@ -20,8 +20,8 @@ limitations under the License.
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
-import cgi
 import json
+import webapp2
 from gallery_api import *
 from google.appengine.api import users
 from google.appengine.datastore.datastore_query import Cursor
@@ -35,34 +35,20 @@ from google.appengine.datastore.datastore_query import Cursor
 # Number of rows per page.
 ROWS_PAGE = 24
 
-forms = cgi.FieldStorage()
-app = forms["app"].value
-isAdmin = (app == "admin")
-
-if isAdmin and not users.is_current_user_admin():
-  print("Status: 401 Unauthorized")
-else:
-  print("Content-Type: text/plain\n")
-
+def renderPage(app, isAdmin, curs):
+  """Fetch one page of art and serialize it as the response body."""
   if isAdmin:
     query = Art.query()
   else:
     query = Art.query(Art.public == True, Art.app == app)
   query = query.order(-Art.created)
-
-  if "cursor" in forms:
-    # Fetch next page of results.
-    curs = Cursor(urlsafe=forms["cursor"].value)
-  else:
-    # Fetch first page of results.
-    curs = None
   (results, next_curs, more) = query.fetch_page(ROWS_PAGE, start_cursor=curs)
 
   data = [];
   for rec in results:
     datum = {"uuid": rec.uuid,
              "app": rec.app,
-             "thumb": rec.thumb,
+             "thumb": thumbUrl(rec.key.integer_id()),
              "title": rec.title}
     if isAdmin:
       datum["public"] = rec.public
@@ -71,4 +57,33 @@ else:
   meta = {"data": data,
           "more": more,
           "cursor": next_curs and next_curs.urlsafe()}
-  print(json.dumps(meta))
+  return json.dumps(meta) + "\n"
+
+
+class ViewHandler(webapp2.RequestHandler):
+  def get(self):
+    params = self.request.params
+    app = params["app"]
+    isAdmin = (app == "admin")
+
+    if isAdmin and not users.is_current_user_admin():
+      self.response.set_status(401)
+      return
+    self.response.headers["Content-Type"] = "text/plain"
+
+    if "cursor" in params:
+      # Fetch next page of results.
+      page = renderPage(app, isAdmin, Cursor(urlsafe=params["cursor"]))
+    elif isAdmin:
+      # Fetch first page of results.
+      page = renderPage(app, isAdmin, None)
+    else:
+      # First pages of public art are cached until admin.py changes them.
+      page = memcache.get(FIRST_PAGE_PREFIX + app)
+      if page is None:
+        page = renderPage(app, isAdmin, None)
+        # 'add' respects the lock left by flushFirstPage.
+        memcache.add(FIRST_PAGE_PREFIX + app, page, FIRST_PAGE_TIME)
+    self.response.write(page)
+
+  post = get
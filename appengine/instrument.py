@@ -0,0 +1,144 @@
+"""Blockly Games: Instrumentation
+
+Copyright 2026 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+"""Log where the time of each request goes.
+
+Middleware installed by appengine_config.py writes one JSON log line per
+request, with its latency, response size, the count and time of its
+datastore and memcache RPCs, memcache hits and misses, and any counters the
+handlers add with count().  An admin can add "profile=1" to a request's
+query string to also log a cProfile of it.
+"""
+
+import cProfile
+import collections
+import json
+import logging
+import pstats
+import StringIO
+import threading
+import time
+import urlparse
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import users
+
+# Query parameter with which an admin asks for a profile of the request.
+PROFILE_PARAM = "profile"
+# Number of functions to list in a profile, by cumulative time.
+PROFILE_ROWS = 40
+# Names of the API services in the log.
+SERVICES = {"datastore_v3": "datastore"}
+
+# Stats of the request being handled by each thread.
+_current = threading.local()
+
+
+class RequestStats(object):
+  """Counters of one request."""
+
+  def __init__(self):
+    self.counters = collections.Counter()
+    # Start time of each RPC in flight.
+    self.starts = {}
+
+
+def count(name, value=1):
+  """Add to a counter of the current request, if it is being instrumented."""
+  stats = getattr(_current, "stats", None)
+  if stats:
+    stats.counters[name] += value
+
+
+def _preCall(service, call, request, response, rpc):
+  stats = getattr(_current, "stats", None)
+  if stats:
+    stats.counters[SERVICES.get(service, service) + "Rpcs"] += 1
+    stats.starts[id(rpc)] = time.time()
+
+
+def _postCall(service, call, request, response, rpc):
+  stats = getattr(_current, "stats", None)
+  if stats:
+    name = SERVICES.get(service, service)
+    start = stats.starts.pop(id(rpc), None)
+    if start is not None:
+      # Asynchronous RPCs are timed until the request waits for them.
+      stats.counters[name + "Ms"] += (time.time() - start) * 1000
+    if service == "memcache" and call == "Get":
+      stats.counters["memcacheHits"] += response.item_size()
+      stats.counters["memcacheMisses"] += (request.key_size() -
+                                           response.item_size())
+
+apiproxy_stub_map.apiproxy.GetPreCallHooks().Append("instrument", _preCall)
+apiproxy_stub_map.apiproxy.GetPostCallHooks().Append("instrument", _postCall)
+
+
+def _wantsProfile(environ):
+  # Only admins may ask, since a profile costs time and reveals code.
+  params = urlparse.parse_qs(environ.get("QUERY_STRING", ""))
+  return PROFILE_PARAM in params and users.is_current_user_admin()
+
+
+class Middleware(object):
+  """WSGI middleware that logs the stats of each request."""
+
+  def __init__(self, app):
+    self.app = app
+
+  def __call__(self, environ, start_response):
+    stats = RequestStats()
+    statuses = []
+    def startResponse(status, headers, exc_info=None):
+      statuses.append(status)
+      return start_response(status, headers, exc_info)
+
+    profiler = cProfile.Profile() if _wantsProfile(environ) else None
+    _current.stats = stats
+    start = time.time()
+    try:
+      if profiler:
+        result = profiler.runcall(self.app, environ, startResponse)
+      else:
+        result = self.app(environ, startResponse)
+      try:
+        body = list(result)
+      finally:
+        if hasattr(result, "close"):
+          result.close()
+    finally:
+      latency = time.time() - start
+      _current.stats = None
+
+    record = dict(stats.counters)
+    for name in record:
+      if name.endswith("Ms"):
+        record[name] = round(record[name], 1)
+    record.update({
+      "method": environ.get("REQUEST_METHOD"),
+      "path": environ.get("PATH_INFO"),
+      "status": int(statuses[-1].split()[0]) if statuses else None,
+      "latencyMs": round(latency * 1000, 1),
+      "responseBytes": sum(len(chunk) for chunk in body),
+    })
+    logging.info("Request stats: %s", json.dumps(record, sort_keys=True))
+    if profiler:
+      output = StringIO.StringIO()
+      pstats.Stats(profiler, stream=output).sort_stats(
+          "cumulative").print_stats(PROFILE_ROWS)
+      logging.info("Profile of %s:\n%s", environ.get("PATH_INFO"),
+                   output.getvalue())
+    return body
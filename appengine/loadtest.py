@@ -0,0 +1,346 @@
+"""Blockly Games: Load Test
+
+Copyright 2026 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+"""Benchmark the storage and gallery handlers locally.
+
+Drives mixes of requests through main.app, with the App Engine SDK's testbed
+standing in for the datastore, memcache and task queue.  Reports throughput,
+latency, datastore and memcache calls per request, and memcache hit ratio.
+The stubs answer instantly, so latency here is the handlers' own CPU time;
+judge datastore cost by the RPC counts.  Not deployed (see app.yaml).
+
+Usage (from this directory, with Python 2.7):
+  python loadtest.py --sdk=PATH/TO/google_appengine [scenario ...]
+"""
+
+import argparse
+import base64
+import collections
+import datetime
+import json
+import random
+import sys
+import time
+import urllib
+
+
+# Number of distinct programs that the scenarios save and load.
+PROGRAMS = 1000
+# Fraction of saves and loads that go to a few popular programs.
+HOT_FRACTION = 0.8
+# Number of popular programs.
+HOT_PROGRAMS = 20
+# Fraction of loads for keys that were never saved.
+UNKNOWN_FRACTION = 0.05
+# Keys requested by each batch load.
+BATCH_SIZE = 30
+# Public works of art per app in the gallery scenarios.
+GALLERY_ROWS = 500
+# Apps whose galleries are browsed.
+GALLERY_APPS = ["turtle", "movie", "music"]
+# Pages a visitor browses before leaving the gallery.
+PAGES_PER_VISIT = 4
+# Unpublished works of art that each expiry sweep deletes.
+EXPIRE_ROWS = 200
+
+
+def setUpSdk(sdk):
+  """Make the App Engine SDK and its bundled libraries importable."""
+  sys.path.insert(0, sdk)
+  import dev_appserver
+  dev_appserver.fix_sys_path()
+
+
+class Stats(object):
+  """Counts the API calls made while a request is being handled."""
+
+  def __init__(self):
+    self.measuring = False
+    self.rpcs = collections.Counter()
+    self.hits = 0
+    self.misses = 0
+
+  def preCall(self, service, call, request, response):
+    if self.measuring:
+      self.rpcs[(service, call)] += 1
+
+  def postCall(self, service, call, request, response):
+    if self.measuring and service == "memcache" and call == "Get":
+      self.hits += response.item_size()
+      self.misses += request.key_size() - response.item_size()
+
+
+def setUpStubs(stats):
+  """Replace the App Engine services with empty in-memory stubs.
+
+  Args:
+    stats: Stats object to record the calls to the stubs.
+
+  Returns:
+    The active testbed.
+  """
+  from google.appengine.api import apiproxy_stub_map
+  from google.appengine.datastore import datastore_stub_util
+  from google.appengine.ext import ndb
+  from google.appengine.ext import testbed
+  bed = testbed.Testbed()
+  bed.activate()
+  # Requests are made by an admin, as app.yaml requires for some handlers.
+  bed.setup_env(USER_EMAIL="admin@example.com", USER_ID="1",
+                USER_IS_ADMIN="1", overwrite=True)
+  # Queries see every write at once, so runs are repeatable.
+  policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+  bed.init_datastore_v3_stub(consistency_policy=policy)
+  bed.init_memcache_stub()
+  bed.init_taskqueue_stub()
+  bed.init_user_stub()
+  ndb.get_context().clear_cache()
+  apiproxy_stub_map.apiproxy.GetPreCallHooks().Append(
+      "loadtest", stats.preCall)
+  apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+      "loadtest", stats.postCall)
+  return bed
+
+
+def makeXml(index):
+  """Make a plausible program of a few KB, unique to its index."""
+  blocks = "".join('<block type="maze_moveForward" id="%d-%d">' % (index, n)
+                   for n in range(10 + index % 40))
+  return ('<xml xmlns="https://developers.google.com/blockly/xml">%s%s</xml>'
+          % (blocks, "</block>" * (10 + index % 40)))
+
+
+def pickProgram():
+  """Pick a program's index, favouring the popular ones."""
+  if random.random() < HOT_FRACTION:
+    return random.randrange(HOT_PROGRAMS)
+  return random.randrange(PROGRAMS)
+
+
+def makeThumb():
+  """Make a data URL of a thumbnail-sized image."""
+  image = "".join(chr(random.randrange(256)) for n in range(2048))
+  return "data:image/png;base64," + base64.b64encode(image)
+
+
+def saveScenario():
+  """Duplicate-heavy saves of programs."""
+  while True:
+    yield ("/storage", {"xml": makeXml(pickProgram())})
+
+
+def loadScenario():
+  """Loads of saved programs, mostly of a few hot keys."""
+  import storage
+  keys = [storage.xmlToKey(makeXml(index)) for index in range(PROGRAMS)]
+  while True:
+    if random.random() < UNKNOWN_FRACTION:
+      key = storage.keyGen()
+    else:
+      key = keys[pickProgram()]
+    yield ("/storage?" + urllib.urlencode({"key": key}), None)
+
+
+def batchLoadScenario():
+  """Loads of many saved programs at once, as a dashboard would."""
+  import storage
+  keys = [storage.xmlToKey(makeXml(index)) for index in range(PROGRAMS)]
+  while True:
+    batch = [keys[pickProgram()] for n in range(BATCH_SIZE)]
+    yield ("/storage?" + urllib.urlencode({"keys": batch}, True), None)
+
+
+def submitScenario():
+  """Submissions of programs to the gallery."""
+  while True:
+    title = "Art %d" % random.randrange(100)
+    yield ("/gallery-api/submit", {"xml": makeXml(pickProgram()),
+                                   "app": random.choice(GALLERY_APPS),
+                                   "thumb": makeThumb(),
+                                   "title": title})
+
+
+def browseScenario():
+  """Visitors paging through the public galleries."""
+  from google.appengine.ext import ndb
+  from gallery_api import Art, Thumb
+  created = datetime.datetime.now()
+  rows = []
+  for app in GALLERY_APPS:
+    for n in range(GALLERY_ROWS):
+      created -= datetime.timedelta(minutes=1)
+      rows.append(Art(app=app, uuid="abcdef", title="Art %d" % n,
+                      public=True, created=created))
+  keys = ndb.put_multi(rows)
+  ndb.put_multi([Thumb(id=key.integer_id(), mime="image/png", image="x")
+                 for key in keys])
+  while True:
+    app = random.choice(GALLERY_APPS)
+    url = "/gallery-api/view?" + urllib.urlencode({"app": app})
+    for page in range(PAGES_PER_VISIT):
+      response = yield (url, None)
+      cursor = json.loads(response.body)["cursor"]
+      if not cursor:
+        break
+      url = "/gallery-api/view?" + urllib.urlencode({"app": app,
+                                                     "cursor": cursor})
+
+
+def expireScenario():
+  """Sweeps that delete a backlog of unpublished art."""
+  from google.appengine.ext import ndb
+  from gallery_api import Art, Thumb
+  created = datetime.datetime.now() - datetime.timedelta(days=1)
+  while True:
+    keys = ndb.put_multi([Art(app="turtle", uuid="abcdef", title="Stale",
+                              public=False, created=created)
+                          for n in range(EXPIRE_ROWS)])
+    ndb.put_multi([Thumb(id=key.integer_id(), mime="image/png", image="x")
+                   for key in keys])
+    # Sweeps run in tasks, which are given the cutoff.
+    before = (datetime.datetime.now() -
+              datetime.datetime(1970, 1, 1)).total_seconds()
+    yield ("/gallery-api/expire?" + urllib.urlencode({"before": before}),
+           None)
+
+
+SCENARIOS = collections.OrderedDict([
+  ("save", saveScenario),
+  ("load", loadScenario),
+  ("batch-load", batchLoadScenario),
+  ("submit", submitScenario),
+  ("browse", browseScenario),
+  ("expire", expireScenario),
+])
+
+
+def percentile(sortedValues, fraction):
+  """Pick a percentile from a sorted list."""
+  return sortedValues[min(len(sortedValues) - 1,
+                          int(len(sortedValues) * fraction))]
+
+
+def runScenario(name, count):
+  """Make some requests of one scenario against fresh stubs.
+
+  Args:
+    name: Name of the scenario.
+    count: Number of requests to make.
+
+  Returns:
+    Dictionary of the results.
+  """
+  import main
+  from google.appengine.ext import ndb
+  stats = Stats()
+  bed = setUpStubs(stats)
+  try:
+    scenario = SCENARIOS[name]()
+    # The first step also fills the datastore.
+    (url, post) = next(scenario)
+    latencies = []
+    errors = 0
+    for n in range(count):
+      # Each request starts with an empty in-context cache, as in production.
+      ndb.get_context().clear_cache()
+      stats.measuring = True
+      start = time.time()
+      # Sent as if from the task queue, so expiry sweeps run in the request.
+      response = main.app.get_response(url, POST=post, headers={
+          "X-AppEngine-QueueName": "default"})
+      latencies.append(time.time() - start)
+      stats.measuring = False
+      if response.status_int >= 400:
+        errors += 1
+      (url, post) = scenario.send(response)
+  finally:
+    bed.deactivate()
+
+  total = float(sum(latencies))
+  latencies.sort()
+  rpcs = collections.Counter()
+  for ((service, call), calls) in stats.rpcs.items():
+    rpcs["%s.%s" % (service, call)] = calls
+  lookups = stats.hits + stats.misses
+  return {
+    "requests": count,
+    "errors": errors,
+    "requestsPerSecond": count / total if total else 0.0,
+    "p50Ms": percentile(latencies, 0.5) * 1000,
+    "p99Ms": percentile(latencies, 0.99) * 1000,
+    "datastoreRpcsPerRequest": sum(calls for (call, calls) in rpcs.items()
+        if call.startswith("datastore_v3.")) / float(count),
+    "memcacheRpcsPerRequest": sum(calls for (call, calls) in rpcs.items()
+        if call.startswith("memcache.")) / float(count),
+    "memcacheHitRatio": float(stats.hits) / lookups if lookups else None,
+    "rpcs": dict(rpcs),
+  }
+
+
+def printResults(name, results):
+  """Print the results of one scenario."""
+  lines = [
+    "%s: %d requests, %.1f requests/s, p50 %.2f ms, p99 %.2f ms, %d errors" %
+        (name, results["requests"], results["requestsPerSecond"],
+         results["p50Ms"], results["p99Ms"], results["errors"]),
+    "  datastore: %.2f RPCs/request  memcache: %.2f RPCs/request" %
+        (results["datastoreRpcsPerRequest"],
+         results["memcacheRpcsPerRequest"]),
+    "  " + ", ".join("%s %d" % item
+                     for item in sorted(results["rpcs"].items())),
+  ]
+  if results["memcacheHitRatio"] is not None:
+    lines[1] += ", %d%% hits" % (results["memcacheHitRatio"] * 100)
+  sys.stdout.write("\n".join(lines) + "\n")
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Benchmark the storage and gallery handlers locally.")
+  # Not checked with choices, which rejects the default of nargs="*".
+  parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                      help="Scenario to run: %s.  Defaults to all." %
+                      ", ".join(SCENARIOS))
+  parser.add_argument("--sdk", required=True,
+                      help="Path of the App Engine SDK's google_appengine "
+                      "directory.")
+  parser.add_argument("--requests", type=int, default=1000,
+                      help="Number of requests per scenario.")
+  parser.add_argument("--seed", type=int, default=0,
+                      help="Seed for the random mixes of requests.")
+  parser.add_argument("--output",
+                      help="Also write the results to this JSON file.")
+  args = parser.parse_args()
+  for name in args.scenarios:
+    if name not in SCENARIOS:
+      parser.error("unknown scenario %r (choose from %s)" %
+                   (name, ", ".join(SCENARIOS)))
+  scenarios = args.scenarios or list(SCENARIOS)
+
+  setUpSdk(args.sdk)
+  allResults = collections.OrderedDict()
+  for name in scenarios:
+    random.seed(args.seed)
+    allResults[name] = runScenario(name, args.requests)
+    printResults(name, allResults[name])
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(allResults, f, indent=2)
+
+
+if __name__ == "__main__":
+  main()
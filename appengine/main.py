@@ -0,0 +1,39 @@
+"""Blockly Games: Request Router
+
+Copyright 2026 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+"""Route all dynamic requests to their handlers in one WSGI application.
+Access control (login, secure) remains in app.yaml.
+"""
+
+import errorReporter
+import reddit
+import storage
+import webapp2
+from gallery_api import admin, expire, submit, thumb, view
+
+
+app = webapp2.WSGIApplication([
+  ("/storage", storage.StorageHandler),
+  ("/storage-backfill", storage.BackfillHandler),
+  ("/errorReporter", errorReporter.ErrorReporterHandler),
+  ("/gallery-api/submit", submit.SubmitHandler),
+  ("/gallery-api/view", view.ViewHandler),
+  ("/gallery-api/thumb", thumb.ThumbHandler),
+  ("/gallery-api/expire", expire.ExpireHandler),
+  ("/gallery-api/admin", admin.AdminHandler),
+  ("/(?:turtle|movie)-reddit", reddit.RedditHandler),
+])
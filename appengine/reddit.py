@@ -20,10 +20,11 @@ limitations under the License.
 
 __author__ = "fraser@google.com (Neil Fraser)"
 
-import os
 import re
+import webapp2
 
-app = re.search(r"(\w+)-reddit$", os.environ.get('PATH_INFO', '')).group(1)
-uuid = os.environ.get('QUERY_STRING', '')
-print("Status: 301 Moved Permanently")
-print("Location: /%s?level=10#%s\n" % (app, uuid))
+class RedditHandler(webapp2.RequestHandler):
+  def get(self):
+    app = re.search(r"(\w+)-reddit$", self.request.path).group(1)
+    uuid = self.request.query_string
+    self.redirect("/%s?level=10#%s" % (app, uuid), permanent=True)
@@ -20,10 +20,16 @@ limitations under the License.
 
 __author__ = "q.neutron@gmail.com (Quynh Neutron)"
 
-import cgi
 import hashlib
+import instrument
+import json
+import logging
+import time
+import webapp2
 from random import randint
 from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
 
 
@@ -39,51 +45,213 @@ class Xml(ndb.Model):
   xml_hash = ndb.IntegerProperty()
   xml_content = ndb.TextProperty()
 
-def xmlToKey(xml_content):
-  # Store XML and return a generated key.
+class XmlHash(ndb.Model):
+  # Dedup index from a content hash (the entity's id) to the key of its row.
+  xml_key = ndb.StringProperty(indexed=False)
+
+def xmlHash(xml_content):
+  # Compute the signed 64-bit content hash used to dedup saves.
+  if isinstance(xml_content, unicode):
+    xml_content = xml_content.encode("utf-8")
   xml_hash = long(hashlib.sha1(xml_content).hexdigest(), 16)
-  xml_hash = int(xml_hash % (2 ** 64) - (2 ** 63))
-  lookup_query = Xml.query(Xml.xml_hash == xml_hash)
-  lookup_result = lookup_query.get()
-  if lookup_result:
-    xml_key = lookup_result.key.string_id()
+  return int(xml_hash % (2 ** 64) - (2 ** 63))
+
+@ndb.transactional_tasklet(xg=True)
+def allocateKeyAsync(xml_hash, xml_content):
+  # Store XML under a free random key, along with its dedup index entry.
+  index = yield XmlHash.get_by_id_async(str(xml_hash))
+  if index:
+    # Another request stored the same XML while this one was in flight.
+    raise ndb.Return(index.xml_key)
+  # Each probe adds an entity group to the transaction (max 25).
+  for trials in range(10):
+    xml_key = keyGen()
+    existing = yield Xml.get_by_id_async(xml_key)
+    if not existing:
+      break
+    # Collisions grow as the table fills; see the request logs.
+    instrument.count("keyGenRetries")
   else:
-    trials = 0
-    result = True
-    while result:
-      trials += 1
-      if trials == 100:
-        raise Exception("Sorry, the generator failed to get a key for you.")
-      xml_key = keyGen()
-      result = Xml.get_by_id(xml_key)
-    row = Xml(id = xml_key, xml_hash = xml_hash, xml_content = xml_content)
-    row.put()
-  return xml_key
+    raise Exception("Sorry, the generator failed to get a key for you.")
+  row = Xml(id = xml_key, xml_hash = xml_hash, xml_content = xml_content)
+  index = XmlHash(id = str(xml_hash), xml_key = xml_key)
+  yield ndb.put_multi_async([row, index])
+  raise ndb.Return(xml_key)
+
+# Memcache prefix for the encoded responses served by keyToXml.
+CACHE_PREFIX = "XML_PAYLOAD_"
+# Seconds to cache a stored row's response.
+CACHE_TIME = 3600
+# Seconds to cache the fact that a key does not exist.
+MISSING_CACHE_TIME = 60
+# Memcache marker for keys that do not exist in the datastore.
+# Distinct from "", which is the response for an empty row.
+MISSING = False
+# Most XML blobs one batch request may save.  Each may start a transaction.
+MAX_BATCH_XMLS = 25
+# Most keys one batch request may load.
+MAX_BATCH_KEYS = 100
+
+def xmlToPayload(xml_content):
+  # Build the encoded response for stored XML.
+  if isinstance(xml_content, str):
+    xml_content = xml_content.decode("utf-8")
+  if xml_content:
+    # Add a poison line to prevent raw content from being served.
+    xml_content = "{[(< UNTRUSTED CONTENT >)]}\n" + xml_content
+  return xml_content.encode("utf-8")
+
+@ndb.tasklet
+def xmlToKeyAsync(xml_content):
+  # Store XML and return a future for its generated key.
+  xml_hash = xmlHash(xml_content)
+  # Repeat saves of the same XML are one keyed get.
+  index = yield XmlHash.get_by_id_async(str(xml_hash))
+  if index:
+    raise ndb.Return(index.xml_key)
+  xml_key = yield allocateKeyAsync(xml_hash, xml_content)
+  # Write through, so the first load of a fresh link skips the datastore.
+  # This also replaces any negative entry left by an earlier probe.
+  yield ndb.get_context().memcache_set(CACHE_PREFIX + xml_key,
+      xmlToPayload(xml_content), time=CACHE_TIME)
+  raise ndb.Return(xml_key)
+
+def xmlToKey(xml_content):
+  # Store XML and return a generated key.
+  return xmlToKeyAsync(xml_content).get_result()
 
 def keyToXml(key_provided):
   # Retrieve stored XML based on the provided key.
   # Normalize the string.
   key_provided = key_provided.lower().strip()
   # Check memcache for a quick match.
-  xml = memcache.get("XML_" + key_provided)
-  if xml is None:
+  payload = memcache.get(CACHE_PREFIX + key_provided)
+  if payload is MISSING:
+    return ""
+  if payload is None:
     # Check datastore for a definitive match.
     result = Xml.get_by_id(key_provided)
     if not result:
-      xml = ""
+      memcache.set(CACHE_PREFIX + key_provided, MISSING, MISSING_CACHE_TIME)
+      return ""
+    payload = xmlToPayload(result.xml_content)
+    # Save to memcache for next hit.
+    memcache.set(CACHE_PREFIX + key_provided, payload, CACHE_TIME)
+  return payload
+
+def xmlsToKeys(xml_contents):
+  # Store many XML blobs and return their keys, in the same order.
+  hashes = [xmlHash(xml_content) for xml_content in xml_contents]
+  contents = dict(zip(hashes, xml_contents))
+  unique_hashes = contents.keys()
+  indexes = ndb.get_multi([ndb.Key(XmlHash, str(xml_hash))
+                           for xml_hash in unique_hashes])
+  keys = {}
+  futures = {}
+  for xml_hash, index in zip(unique_hashes, indexes):
+    if index:
+      keys[xml_hash] = index.xml_key
     else:
-      xml = result.xml_content
+      # Allocations are independent transactions, run them concurrently.
+      futures[xml_hash] = allocateKeyAsync(xml_hash, contents[xml_hash])
+  payloads = {}
+  for xml_hash, future in futures.items():
+    keys[xml_hash] = future.get_result()
+    payloads[keys[xml_hash]] = xmlToPayload(contents[xml_hash])
+  if payloads:
+    memcache.set_multi(payloads, CACHE_TIME, key_prefix=CACHE_PREFIX)
+  return [keys[xml_hash] for xml_hash in hashes]
+
+def keysToXml(keys_provided):
+  # Retrieve many stored XML blobs.  Returns a map from key to response.
+  normalized = dict((key, key.lower().strip()) for key in keys_provided)
+  unique_keys = [key for key in set(normalized.values()) if key]
+  # Check memcache for quick matches.
+  payloads = memcache.get_multi(unique_keys, key_prefix=CACHE_PREFIX)
+  misses = [key for key in unique_keys if key not in payloads]
+  if misses:
+    # Check datastore for definitive matches.
+    results = ndb.get_multi([ndb.Key(Xml, key) for key in misses])
+    found = {}
+    missing = {}
+    for key, result in zip(misses, results):
+      if result:
+        found[key] = xmlToPayload(result.xml_content)
+      else:
+        missing[key] = MISSING
     # Save to memcache for next hit.
-    memcache.add("XML_" + key_provided, xml, 3600)
-  if xml:
-    # Add a poison line to prevent raw content from being served.
-    xml = "{[(< UNTRUSTED CONTENT >)]}\n" + xml
-  return xml.encode("utf-8")
-
-if __name__ == "__main__":
-  print("Content-Type: text/plain\n")
-  forms = cgi.FieldStorage()
-  if "xml" in forms:
-    print(xmlToKey(forms["xml"].value))
-  if "key" in forms:
-    print(keyToXml(forms["key"].value))
+    if found:
+      memcache.set_multi(found, CACHE_TIME, key_prefix=CACHE_PREFIX)
+    if missing:
+      memcache.set_multi(missing, MISSING_CACHE_TIME, key_prefix=CACHE_PREFIX)
+    payloads.update(found)
+  return dict((key, payloads.get(normalized[key]) or "")
+              for key in keys_provided)
+
+class StorageHandler(webapp2.RequestHandler):
+  def post(self):
+    params = self.request.params
+    if "xmls" in params or "keys" in params:
+      # Batch mode: several "xmls" and "keys" fields, answered as JSON.
+      xml_contents = params.getall("xmls")
+      keys_provided = params.getall("keys")
+      if (len(xml_contents) > MAX_BATCH_XMLS or
+          len(keys_provided) > MAX_BATCH_KEYS):
+        self.response.set_status(400)
+        return
+      self.response.headers["Content-Type"] = "application/json"
+      results = {}
+      if "xmls" in params:
+        results["saved"] = xmlsToKeys(xml_contents)
+      if "keys" in params:
+        results["loaded"] = keysToXml(keys_provided)
+      self.response.write(json.dumps(results) + "\n")
+    else:
+      self.response.headers["Content-Type"] = "text/plain"
+      if "xml" in params:
+        self.response.write(xmlToKey(params["xml"]) + "\n")
+      if "key" in params:
+        self.response.write(keyToXml(params["key"]) + "\n")
+
+  get = post
+
+
+# Rows per page of the dedup index backfill.
+BACKFILL_ROWS = 500
+# Seconds to spend backfilling before handing the rest to a new task.
+# Well under the deadline of a task, so the chain always continues.
+BACKFILL_BUDGET = 30
+
+class BackfillHandler(webapp2.RequestHandler):
+  # Add XmlHash entries for the rows saved before that index existed, so
+  # that saving their content again returns their key.  Run once by an
+  # admin; the work is done by a chain of tasks, each given:
+  # - cursor: Opaque pointer string.
+  def get(self):
+    self.response.headers["Content-Type"] = "text/plain"
+    if "X-AppEngine-QueueName" not in self.request.headers:
+      taskqueue.add(url="/storage-backfill", method="GET")
+      self.response.write("Backfill started in a task.\n")
+      return
+    start = time.time()
+    params = self.request.params
+    curs = Cursor(urlsafe=params["cursor"]) if "cursor" in params else None
+    # A projection only reads the hash, not the XML.
+    query = Xml.query(projection=[Xml.xml_hash])
+    count = 0
+    more = True
+    while more and time.time() - start < BACKFILL_BUDGET:
+      (rows, curs, more) = query.fetch_page(BACKFILL_ROWS, start_cursor=curs)
+      # Where several rows share a hash, any of their keys will do.
+      ndb.put_multi([XmlHash(id = str(row.xml_hash),
+                             xml_key = row.key.string_id())
+                     for row in rows])
+      count += len(rows)
+    if more:
+      taskqueue.add(url="/storage-backfill", method="GET",
+                    params={"cursor": curs.urlsafe()})
+    report = "Indexed %d rows in %.1f seconds." % (count, time.time() - start)
+    if more:
+      report += "  Continuing in a new task."
+    logging.info(report)
+    self.response.write(report + "\n")
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# Times each stage of the build and measures the size of its outputs.
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Runs messages_to_json.py, json_to_js.py and compress.py, and writes a JSON
+# report of:
+#   stages: The wall time, CPU time and peak memory of each script, and of
+#       the closurebuilder, Closure Compiler and message stages of each game.
+#       A stage's peak memory is that of the tools it ran, so the message
+#       stages, which run none, report 0.
+#   sizes: The size of each game's compiled code, and of each of its
+#       message files.
+# If a baseline report is given, any number that grew by more than the
+# threshold is listed, and the script fails.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+if sys.version_info[0] < 3:
+    raise Exception("Must be using Python 3")
+
+# Games built by 'make games'.
+GAMES = ['index', 'puzzle', 'maze', 'bird', 'turtle', 'movie', 'music',
+         'pond/tutor', 'pond/duck', 'gallery']
+
+# Where compress.py writes the timings of its stages.
+COMPRESS_TIMINGS = 'build/generated/compress-timings.json'
+
+# Stamp written by compress.py to each game's generated directory.
+STAMP = '.inputs.json'
+
+# Changes in time smaller than this many seconds are noise, not regressions.
+MIN_SECONDS = 0.5
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Time the build and measure the size of its outputs.')
+  parser.add_argument('games', nargs='*', metavar='game', default=GAMES,
+                      help='Game to build, e.g. "maze" or "pond/duck".  '
+                      'Defaults to all games.')
+  parser.add_argument('--chunked', action='store_true',
+                      help='Compile all games in one run, as "make games" '
+                      'does.')
+  parser.add_argument('--incremental', action='store_true',
+                      help='Only rebuild what changed, instead of '
+                      'everything.')
+  parser.add_argument('--output', default='build/generated/benchmark.json',
+                      help='Path of the JSON report to write.')
+  parser.add_argument('--baseline',
+                      help='Path of a previous report to compare against.')
+  parser.add_argument('--threshold', type=float, default=0.1,
+                      help='Fraction by which a number may grow before it '
+                      'counts as a regression.  Defaults to 0.1.')
+  args = parser.parse_args()
+
+  force = [] if args.incremental else ['--force']
+  compressCmd = ['build/compress.py', '--timings', COMPRESS_TIMINGS]
+  compressCmd += force + (['--chunked'] if args.chunked else []) + args.games
+  os.makedirs(os.path.dirname(COMPRESS_TIMINGS), exist_ok=True)
+  stages = {}
+  stages['messages_to_json'] = runStage(['build/messages_to_json.py'])
+  stages['json_to_js'] = runStage(['build/json_to_js.py'] + force)
+  stages['compress'] = runStage(compressCmd)
+  with open(COMPRESS_TIMINGS) as f:
+    for (name, usage) in json.load(f).items():
+      stages['compress/' + name] = usage
+  report = {'stages': stages, 'sizes': measureSizes(args.games)}
+
+  directory = os.path.dirname(args.output)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  with open(args.output, 'w') as f:
+    json.dump(report, f, indent=2, sort_keys=True)
+  for name in sorted(stages):
+    usage = stages[name]
+    print('%-32s %8.2fs wall %8.2fs CPU %8d KB peak' %
+          (name, usage['wallSeconds'], usage['cpuSeconds'], usage['peakKb']))
+  print('Wrote %s.' % args.output)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = compare(baseline, report, args.threshold)
+    for regression in regressions:
+      print('Regression: %s' % regression)
+    if regressions:
+      sys.exit(1)
+    print('No regressions against %s.' % args.baseline)
+
+
+def runStage(cmd):
+  """Run a build script and measure the resources it used.
+
+  CPU time and peak memory include any processes it started and waited for.
+
+  Args:
+    cmd: The script and its arguments.
+
+  Returns:
+    Dictionary of the wall time, CPU time and peak memory.
+  """
+  print('Running %s' % ' '.join(cmd))
+  start = time.perf_counter()
+  proc = subprocess.Popen([sys.executable] + cmd, stdout=subprocess.DEVNULL)
+  (pid, status, usage) = os.wait4(proc.pid, 0)
+  wall = time.perf_counter() - start
+  proc.returncode = os.waitstatus_to_exitcode(status)
+  if proc.returncode:
+    raise Exception('"%s" failed with exit code %d.' %
+                    (' '.join(cmd), proc.returncode))
+  return {
+    'wallSeconds': round(wall, 3),
+    'cpuSeconds': round(usage.ru_utime + usage.ru_stime, 3),
+    # Linux reports the peak in KB.
+    'peakKb': usage.ru_maxrss,
+  }
+
+
+def measureSizes(gameNames):
+  """Measure the size of each game's compiled code and message files.
+
+  The code is the game's compressed.js plus any chunks it loads.
+
+  Args:
+    gameNames: List of game names, e.g. "maze" or "pond/duck".
+
+  Returns:
+    Dictionary of each game's code size and message file sizes, in bytes.
+  """
+  sizes = {}
+  for gameName in gameNames:
+    generatedDir = 'appengine/%s/generated' % gameName
+    try:
+      with open('%s/%s' % (generatedDir, STAMP)) as f:
+        chunks = json.load(f).get('chunks', [])
+    except (IOError, ValueError):
+      chunks = []
+    code = ['%s/compressed.js' % generatedDir]
+    code += ['appengine/' + chunk for chunk in chunks]
+    messages = {}
+    msgDir = '%s/msg' % generatedDir
+    for filename in sorted(os.listdir(msgDir)):
+      (lang, ext) = os.path.splitext(filename)
+      # Skip the copies written by fingerprint.py.
+      if ext == '.js' and not isHashed(lang):
+        messages[lang] = os.path.getsize(os.path.join(msgDir, filename))
+    sizes[gameName] = {
+      'code': sum(os.path.getsize(path) for path in code),
+      'messages': messages,
+    }
+  return sizes
+
+
+def isHashed(name):
+  """True if a file name ends in a hash added by fingerprint.py."""
+  (root, sep, digest) = name.rpartition('-')
+  return len(digest) == 16 and all(c in '0123456789abcdef' for c in digest)
+
+
+def compare(baseline, report, threshold):
+  """List the numbers of a report that grew too much since a baseline.
+
+  Args:
+    baseline: A previous report.
+    report: The current report.
+    threshold: Fraction by which a number may grow.
+
+  Returns:
+    List of descriptions of the regressions.
+  """
+  old = flatten(baseline)
+  new = flatten(report)
+  regressions = []
+  for (name, value) in sorted(new.items()):
+    if name not in old or value <= old[name] * (1 + threshold):
+      continue
+    if name.endswith('Seconds') and value - old[name] < MIN_SECONDS:
+      continue
+    regressions.append('%s grew from %s to %s.' % (name, old[name], value))
+  return regressions
+
+
+def flatten(tree, prefix=''):
+  """Flatten nested dictionaries of numbers, e.g. {"a.b": 1}."""
+  numbers = {}
+  for (key, value) in tree.items():
+    if isinstance(value, dict):
+      numbers.update(flatten(value, prefix + key + '.'))
+    else:
+      numbers[prefix + key] = value
+  return numbers
+
+
+if __name__ == '__main__':
+  main()
@@ -1,5 +1,5 @@
 #!/usr/bin/python
-# Compresses the files for one game into a single JavaScript file.
+# Compresses the files for one or more games, each into a single JavaScript file.
 #
 # Copyright 2013 Google LLC
 #
@@ -21,16 +21,31 @@
 # The compressed file is a concatenation of all the relevant JavaScript which
 # has then been run through Google's Closure Compiler.
 # The uncompressed file is a script that loads in each JavaScript file
-# one by one.  This takes much longer for a browser to load, but is useful
-# when debugging code since line numbers are meaningful and variables haven't
+# in parallel.  The third-party libraries at the start are loaded as a few
+# shared bundles with source maps, followed by each of Blockly Games' own
+# files.  This takes longer for a browser to load, but is useful when
+# debugging code since line numbers are meaningful and variables haven't
 # been renamed.  The uncompressed file also allows for a faster development
 # cycle since there is no need to rebuild or recompile, just reload.
 
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import fcntl
+import functools
+import glob
+import hashlib
+import io
+import itertools
 import json
+import os
 import os.path
+import pickle
 import re
 import subprocess
 import sys
+import time
 
 
 if sys.version_info[0] < 3:
@@ -39,84 +54,424 @@ if sys.version_info[0] < 3:
 # Define a warning message for all the generated files.
 WARNING = '// Automatically generated file.  Do not edit!\n'
 
-blocklyMessageNames = []
-blocklyGamesMessageNames = []
-
-def main(gameName):
-  print('Compressing %s' % gameName.title())
-  if not os.path.exists('appengine/%s/generated' % gameName):
-    os.mkdir('appengine/%s/generated' % gameName)
-  generate_uncompressed(gameName)
-  generate_compressed(gameName)
-  filterMessages(gameName)
-
-  # Extract the list of supported languages from boot.js.
-  # This is a bit fragile.
-  boot = open('appengine/common/boot.js', 'r')
-  js = ' '.join(boot.readlines())
-  boot.close()
-  m = re.search('\[\'BlocklyGamesLanguages\'\] = (\[[-,\'\\s\\w]+\])', js)
-  if not m:
-    raise Exception("Can't find BlocklyGamesLanguages in boot.js")
-  langs = m.group(1)
-  langs = langs.replace("'", '"')
-  langs = json.loads(langs)
-
-  for lang in langs:
-    language(gameName, lang)
-  print("")
-
-
-def filterMessages(gameName):
-  global blocklyMessageNames, blocklyGamesMessageNames
-  # Identify all the Blockly messages used.
-  # Load the compiled game.
-  f = open('appengine/%s/generated/compressed.js' % gameName, 'r')
-  js = f.read()
+# Name of the file in each game's generated directory that records the hashes
+# of the inputs its outputs were built from.
+STAMP = '.inputs.json'
+
+# Inputs shared by every game's compiled code.
+SHARED_CODE_INPUTS = [
+  'build/compress.py',
+  'build/third-party-downloads/closure-compiler.jar',
+  'third-party/closurebuilder/*.py',
+  'externs/*.js',
+  'appengine/third-party/**/*.js',
+  'appengine/src/*.js',
+]
+
+# File where closurebuilder caches the provides and requires of each source.
+DEPS_CACHE = 'build/generated/deps-cache.json'
+
+# Matches the generated files named after their contents, which closurebuilder
+# need not scan.
+HASHED_FILE_PATTERN = r'-[0-9a-f]{16}\.js$'
+
+# Closure Compiler command and the flags shared by every compilation.
+COMPILER = [
+  'java',
+  '-jar', 'build/third-party-downloads/closure-compiler.jar',
+  '--generate_exports',
+  '--compilation_level', 'ADVANCED_OPTIMIZATIONS',
+  '--dependency_mode=PRUNE',
+  '--externs', 'externs/interpreter-externs.js',
+  '--externs', 'externs/prettify-externs.js',
+  '--externs', 'externs/soundJS-externs.js',
+  '--externs', 'externs/storage-externs.js',
+  '--externs', 'externs/svg-externs.js',
+  #'--language_in', 'STABLE',
+  '--language_out', 'ECMASCRIPT5',
+  '--warning_level', 'QUIET',
+]
+
+# Matches anything that may be a message name between double quotes.
+# Quotes are not paired up, since regex literals such as /"/g and strings
+# such as '"' would throw the pairing off for the rest of the line.
+QUOTED_NAME_REGEX = re.compile(r'(?<=")[\w.$-]+(?=")')
+# Matches a run of dotted property names in compiled code.
+PROPERTY_REGEX = re.compile(r'\.([\w$]+(?:\.[\w$]+)*)')
+# Matches a reference to a Blockly message from inside a string.
+BKY_REGEX = re.compile(r'%\{BKY_\w+\}')
+
+# Directory of the shared library bundles loaded by uncompressed.js, and of
+# the common chunk loaded by chunked builds of compressed.js.
+DEV_BUNDLE_DIR = 'appengine/common/generated'
+
+# Files in these directories are bundled.  They are only edited when a
+# library is updated, unlike Blockly Games' own code.
+DEV_BUNDLE_PREFIXES = ('third-party/',)
+
+# Matches a 'use strict' directive at the start of a script, after comments.
+STRICT_REGEX = re.compile(
+    r'''(?:\s|//[^\n]*|/\*.*?\*/)*(['"])use strict\1''', re.DOTALL)
+
+# Lock file that runs hold shared while they write bundles and chunks, and
+# exclusive while they delete the ones no longer loaded.
+BUNDLE_LOCK = 'build/generated/bundles.lock'
+
+# Glob patterns of the generated scripts that load bundles and chunks.
+LOADERS = [
+  'appengine/*/generated/uncompressed.js',
+  'appengine/*/*/generated/uncompressed.js',
+  'appengine/*/generated/compressed.js',
+  'appengine/*/*/generated/compressed.js',
+]
+
+# Glob patterns of the bundles and chunks, which are named after their
+# contents.  Source maps of bundles are named after the bundle.
+BUNDLES = [
+  DEV_BUNDLE_DIR + '/dev-*.js',
+  DEV_BUNDLE_DIR + '/common-*.js',
+  'appengine/*/generated/chunk-*.js',
+  'appengine/*/*/generated/chunk-*.js',
+]
+
+# Matches a loader's reference to a bundle or chunk.
+BUNDLE_REF_REGEX = re.compile(
+    r'"(?:\.\./)?([-\w/]+/generated/(?:dev|common|chunk)-[0-9a-f]{16}\.js)"')
+
+# Base 64 digits of source map VLQs.
+VLQ_DIGITS = ('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+              '0123456789+/')
+
+# Resources used by each timed stage run by this process, by stage name.
+timings = {}
+
+# Resource usage of each tool run by this process, as returned by wait4.
+toolUsages = []
+
+# Directory of the parsed messages written by json_to_js.py.
+MSG_STORE = 'build/generated/msg'
+
+# Inputs shared by every game's message files.
+SHARED_MSG_INPUTS = [
+  MSG_STORE + '/*.pickle',
+]
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compress one or more games.')
+  parser.add_argument('games', nargs='+', metavar='game',
+                      help='Game to compress, e.g. "maze" or "pond/duck".')
+  parser.add_argument('--force', action='store_true',
+                      help='Rebuild even if no inputs have changed.')
+  parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='Number of games to compress in parallel.')
+  parser.add_argument('--chunked', action='store_true',
+                      help='Compile all games in one Closure Compiler run, '
+                      'so the JVM starts once and the shared sources are '
+                      'parsed once.  Code used by two or more games is '
+                      'served once, in a common chunk that all of them '
+                      'share.')
+  parser.add_argument('--timings', metavar='FILE',
+                      help='Write the wall time, CPU time and peak memory of '
+                      'each stage to this JSON file.')
+  args = parser.parse_args()
+
+  langs = getLanguages()
+  # Hash the inputs that all games share only once.
+  sharedCodeHash = hashFiles(SHARED_CODE_INPUTS)
+  sharedMsgHash = hashFiles(SHARED_MSG_INPUTS)
+  codeHashes = {}
+  for gameName in args.games:
+    codeHashes[gameName] = hashFiles(['appengine/%s/src/*.js' % directory
+                                      for directory in gameDirectories(gameName)],
+                                     sharedCodeHash)
+
+  os.makedirs(os.path.dirname(BUNDLE_LOCK), exist_ok=True)
+  with open(BUNDLE_LOCK, 'a') as lock:
+    # Other runs (e.g. of "make -j") may not delete bundles while this one
+    # has written bundles but not yet the loaders that refer to them.
+    fcntl.flock(lock, fcntl.LOCK_SH)
+    chunks = {}
+    if args.chunked:
+      # Each game's compiled code now depends on every game in the run.
+      batchHash = hashFiles([], 'chunked:' + ':'.join(
+          codeHashes[gameName] for gameName in args.games))
+      codeHashes = dict.fromkeys(args.games, batchHash)
+      if args.force or any(isCodeStale(gameName, batchHash)
+                           for gameName in args.games):
+        with timeStage('chunked/compiler'):
+          chunks = generate_chunked(args.games)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.jobs) as pool:
+      futures = [pool.submit(compressGame, gameName, langs,
+                             codeHashes[gameName], sharedMsgHash, args.force,
+                             chunks.get(gameName))
+                 for gameName in args.games]
+      # Print each game's log as a block, in the order requested.
+      for future in futures:
+        (log, gameTimings) = future.result()
+        print(log)
+        timings.update(gameTimings)
+    # Wait for other runs to finish writing their loaders.
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    removeStaleBundles()
+
+  if args.timings:
+    with open(args.timings, 'w') as f:
+      json.dump(timings, f, indent=2, sort_keys=True)
+
+
+def compressGame(gameName, langs, codeHash, sharedMsgHash, force, chunks):
+  """Compress one game, skipping any stage whose inputs have not changed.
+
+  Args:
+    gameName: Name of the game, e.g. "maze" or "pond/duck".
+    langs: List of language codes to write message files for.
+    codeHash: Hash of all the code inputs of this game.
+    sharedMsgHash: Hash of the message inputs that all games share.
+    force: If true, rebuild every stage regardless of the hashes.
+    chunks: List of this game's chunk files, if generate_chunked just wrote
+        its compressed.js.  Otherwise None.
+
+  Returns:
+    Tuple of the log of this game's build, and the resources used by each
+    stage that ran.
+  """
+  timings.clear()
+  log = io.StringIO()
+  with contextlib.redirect_stdout(log):
+    print('Compressing %s' % gameName.title())
+    generatedDir = 'appengine/%s/generated' % gameName
+    if not os.path.exists(generatedDir):
+      os.mkdir(generatedDir)
+    stamp = readStamp(gameName)
+
+    if chunks is not None or force or isCodeStale(gameName, codeHash):
+      # Forget the last build, so a failed one is never taken as up to date.
+      removeStamp(gameName)
+      with timeStage('%s/closurebuilder' % gameName):
+        generate_uncompressed(gameName)
+      if chunks is None:
+        with timeStage('%s/compiler' % gameName):
+          generate_compressed(gameName)
+      stamp = {'code': codeHash}
+      if chunks is not None:
+        stamp['chunks'] = chunks
+    else:
+      print('Code is up to date.')
+
+    # Which messages are written depends on the compiled code.
+    # Chunk files are named after their contents, so compressed.js changes
+    # whenever they do.
+    msgHash = hashFiles(['%s/compressed.js' % generatedDir], sharedMsgHash)
+    if force or stamp.get('msg') != msgHash:
+      with timeStage('%s/messages' % gameName):
+        compiledFiles = stamp.get('chunks',
+                                  ['%s/generated/compressed.js' % gameName])
+        (blocklyMessageNames, blocklyGamesMessageNames) = \
+            filterMessages(compiledFiles)
+        for lang in langs:
+          language(gameName, lang, blocklyMessageNames,
+                   blocklyGamesMessageNames)
+      stamp['msg'] = msgHash
+    else:
+      print('Messages are up to date.')
+    # Only reached once every stage has succeeded.
+    writeStamp(gameName, stamp)
+  return (log.getvalue(), dict(timings))
+
+
+@contextlib.contextmanager
+def timeStage(name):
+  """Record the resources used by a stage of the build in timings.
+
+  CPU time includes any tools the stage runs.  Peak memory is the largest
+  resident set of those tools, or 0 if it runs none.  This process's own
+  peak would also cover the stages it ran before, so it is left out.
+
+  Args:
+    name: Name of the stage, e.g. "maze/compiler".
+  """
+  wallStart = time.perf_counter()
+  cpuStart = time.process_time()
+  del toolUsages[:]
+  yield
+  timings[name] = {
+    'wallSeconds': round(time.perf_counter() - wallStart, 3),
+    'cpuSeconds': round(time.process_time() - cpuStart +
+                        sum(tool.ru_utime + tool.ru_stime
+                            for tool in toolUsages), 3),
+    # Linux reports the peak in KB.
+    'peakKb': max([0] + [tool.ru_maxrss for tool in toolUsages]),
+  }
+
+
+def isCodeStale(gameName, codeHash):
+  """Does this game's compiled code need rebuilding?"""
+  generatedDir = 'appengine/%s/generated' % gameName
+  outputs = ['%s/uncompressed.js' % generatedDir,
+             '%s/compressed.js' % generatedDir]
+  return (readStamp(gameName).get('code') != codeHash or
+          not all(map(os.path.exists, outputs)))
+
+
+def gameDirectories(gameName):
+  """List a game's directory and each of its parents, e.g. pond/duck, pond."""
+  directories = []
+  directory = gameName
+  while directory:
+    directories.append(directory)
+    (directory, sep, fragment) = directory.rpartition(os.path.sep)
+  return directories
+
+
+def hashFiles(patterns, seed=''):
+  """Hash the paths and contents of all files matching some glob patterns.
+
+  Args:
+    patterns: List of glob patterns.  '**' matches any number of directories.
+    seed: Optional hash of other inputs to combine into the result.
+
+  Returns:
+    Hex digest of the inputs.
+  """
+  hasher = hashlib.sha1(seed.encode('utf-8'))
+  paths = set()
+  for pattern in patterns:
+    paths.update(glob.glob(pattern, recursive=True))
+  for path in sorted(paths):
+    hasher.update(path.encode('utf-8') + b'\0')
+    with open(path, 'rb') as f:
+      hasher.update(hashlib.sha1(f.read()).digest())
+  return hasher.hexdigest()
+
+
+def readStamp(gameName):
+  """Load the input hashes recorded by this game's last build."""
+  try:
+    with open('appengine/%s/generated/%s' % (gameName, STAMP)) as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {}
+
+
+def writeStamp(gameName, stamp):
+  """Record the input hashes of this game's current outputs."""
+  with open('appengine/%s/generated/%s' % (gameName, STAMP), 'w') as f:
+    json.dump(stamp, f)
+
+
+def removeStamp(gameName):
+  """Forget the input hashes recorded by this game's last build."""
+  try:
+    os.remove('appengine/%s/generated/%s' % (gameName, STAMP))
+  except FileNotFoundError:
+    pass
+
+
+def getLanguages():
+  """Load the list of supported languages from the message store."""
+  return readStore('index')['languages']
+
+
+def readStore(name):
+  """Load one file of the message store written by json_to_js.py."""
+  try:
+    f = open('%s/%s.pickle' % (MSG_STORE, name), 'rb')
+  except IOError:
+    raise Exception("Can't find the message store.  Run build/json_to_js.py.")
+  data = pickle.load(f)
   f.close()
+  return data
+
+
+def filterMessages(compiledFiles):
+  """Identify all the Blockly and Blockly Games messages a game uses.
+
+  Args:
+    compiledFiles: List of the game's compiled files, relative to appengine/.
+
+  Returns:
+    Tuple of sorted lists of Blockly and Blockly Games message names.
+  """
+  # Index the compiled game.
+  tokens = set()
+  for compiledFile in compiledFiles:
+    f = open('appengine/' + compiledFile, 'r')
+    tokens.update(getTokens(f.read()))
+    f.close()
   # Load any language file (they all should have the same keys).
-  msgs = getMessages('en')
-  for msg in msgs:
-    m = re.search('BlocklyMsg\["([^"]+)"\] = ', msg)
-    if m:
-      if (('"' + m.group(1) + '"') in js or
-          ('.' + m.group(1)) in js or
-          ('%{BKY_' + m.group(1) + '}') in js):
-        blocklyMessageNames.append(m.group(1))
-    m = re.search('BlocklyGamesMsg\["([^"]+)"\] = ', msg)
-    if m:
-      if ('"' + m.group(1) + '"') in js or ('.' + m.group(1)) in js:
-        blocklyGamesMessageNames.append(m.group(1))
+  (blocklyMsgs, blocklyGamesMsgs) = getMessages('en')
+  blocklyMessageNames = [name for name in blocklyMsgs
+      if ('"' + name + '"') in tokens or
+         ('.' + name) in tokens or
+         ('%{BKY_' + name + '}') in tokens]
+  blocklyGamesMessageNames = [name for name in blocklyGamesMsgs
+      if ('"' + name + '"') in tokens or ('.' + name) in tokens]
   print("Found %d Blockly messages." % len(blocklyMessageNames))
   blocklyMessageNames.sort()
   print("Found %d Blockly Games messages." % len(blocklyGamesMessageNames))
   blocklyGamesMessageNames.sort()
+  return (blocklyMessageNames, blocklyGamesMessageNames)
 
 
+def getTokens(js):
+  """Index the ways compiled code can refer to a message.
+
+  Args:
+    js: Compiled JavaScript.
+
+  Returns:
+    Set containing each name between double quotes (with its quotes), each
+    run of one or more dotted property names (with a leading '.'), and each
+    '%{BKY_...}' reference found in the code.  A few extra tokens only add a
+    few unused messages.
+  """
+  tokens = set()
+  for m in QUOTED_NAME_REGEX.finditer(js):
+    tokens.add('"' + m.group(0) + '"')
+  for m in PROPERTY_REGEX.finditer(js):
+    # "a.b.c" may be looked up as ".a", ".a.b", ".b.c", etc.
+    parts = m.group(1).split('.')
+    for start in range(len(parts)):
+      for end in range(start + 1, len(parts) + 1):
+        tokens.add('.' + '.'.join(parts[start:end]))
+  for m in BKY_REGEX.finditer(js):
+    tokens.add(m.group(0))
+  return tokens
+
+
+@functools.lru_cache(maxsize=None)
 def getMessages(lang):
-  # Read all messages for this language.
-  blocklyMsgFileName = 'appengine/generated/msg/%s.js' % lang
-  f = open(blocklyMsgFileName, 'r')
-  msgs = f.readlines()
-  f.close()
-  return msgs
+  """Load all messages for this language.
+
+  Parsed messages are cached, so a process that compresses several games
+  only loads each language once.
+
+  Args:
+    lang: Language code, e.g. "en".
+
+  Returns:
+    Tuple of dicts of Blockly and Blockly Games messages.  Each maps a
+    message name to its JavaScript string literal, in file order.
+  """
+  msgs = readStore(lang)
+  return (msgs['BlocklyMsg'], msgs['BlocklyGamesMsg'])
 
 
-def language(gameName, lang):
-  global blocklyMessageNames, blocklyGamesMessageNames
-  msgs = getMessages(lang)
+def language(gameName, lang, blocklyMessageNames, blocklyGamesMessageNames):
+  (blocklyMsgs, blocklyGamesMsgs) = getMessages(lang)
   # Only write out messages that are used (as detected in filterMessages).
-  bMsgs = []
-  bgMsgs = []
-  for msg in msgs:
-    m = re.search('BlocklyMsg\["([^"]+)"\] = (.*);\s*', msg)
-    if m and m.group(1) in blocklyMessageNames:
-      # Blockly message names are all alphabetic, no need to quote.
-      bMsgs.append('%s:%s' % (m.group(1), m.group(2)))
-    m = re.search('BlocklyGamesMsg\["([^"]+)"\] = (.*);\s*', msg)
-    if m and m.group(1) in blocklyGamesMessageNames:
-      # Blockly Games message names contain dots, quotes required.
-      bgMsgs.append('"%s":%s' % (m.group(1), m.group(2)))
+  blocklyMessageNames = set(blocklyMessageNames)
+  blocklyGamesMessageNames = set(blocklyGamesMessageNames)
+  # Blockly message names are all alphabetic, no need to quote.
+  bMsgs = ['%s:%s' % (name, value) for (name, value) in blocklyMsgs.items()
+           if name in blocklyMessageNames]
+  # Blockly Games message names contain dots, quotes required.
+  bgMsgs = ['"%s":%s' % (name, value)
+            for (name, value) in blocklyGamesMsgs.items()
+            if name in blocklyGamesMessageNames]
 
   if not os.path.exists('appengine/%s/generated/msg' % gameName):
     os.mkdir('appengine/%s/generated/msg' % gameName)
@@ -135,84 +490,220 @@ def generate_uncompressed(gameName):
       '--root=appengine/generated/',
       '--root=appengine/src/',
       '--exclude=',
+      '--cache_file=%s' % DEPS_CACHE,
+      '--exclude_pattern=%s' % HASHED_FILE_PATTERN,
       '--namespace=%s' % gameName.replace('/', '.').title()]
-  directory = gameName
-  while directory:
+  for directory in gameDirectories(gameName):
     subdir = 'appengine/%s/generated/' % directory
     if os.path.isdir(subdir):
       cmd.append('--root=%s' % subdir)
     subdir = 'appengine/%s/src/' % directory
     if os.path.isdir(subdir):
       cmd.append('--root=%s' % subdir)
-    (directory, sep, fragment) = directory.rpartition(os.path.sep)
   try:
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
   except:
     raise Exception("Failed to Popen: %s" % ' '.join(cmd))
   files = readStdout(proc)
 
-  if gameName == 'pond/docs':
-    path = '../'
-  else:
-    path = ''
+  path = relativeRoot(gameName)
   prefix = 'appengine/'
-  srcs = []
+  files = [file.strip() for file in files]
   for file in files:
-    file = file.strip()
-    if file[:len(prefix)] == prefix:
-      file = file[len(prefix):]
-    else:
+    if file[:len(prefix)] != prefix:
       raise Exception('"%s" is not in "%s".' % (file, prefix))
+  files = [file[len(prefix):] for file in files]
+  # The libraries at the start of the dependency order are bundled.
+  # Any prefix of the order still has all its dependencies first.
+  split = 0
+  while split < len(files) and files[split].startswith(DEV_BUNDLE_PREFIXES):
+    split += 1
+  srcs = []
+  # Only a script's first directive makes it strict, so strict and sloppy
+  # files go in separate bundles, each in the mode its files were written for.
+  for (strict, group) in itertools.groupby(files[:split], isStrict):
+    bundle = generate_dev_bundle(list(group))
+    srcs.append('"%s%s"' % (path, bundle))
+  bundles = len(srcs)
+  for file in files[split:]:
     srcs.append('"%s%s"' % (path, file))
-  f = open('appengine/%s/generated/uncompressed.js' % gameName, 'w')
-  f.write("""%s
-window.CLOSURE_NO_DEPS = true;
+  writeLoader('appengine/%s/generated/uncompressed.js' % gameName, srcs,
+              'window.CLOSURE_NO_DEPS = true;\n\n')
+  print('Found %d dependencies, %d in %d shared bundles.' %
+        (len(files), split, bundles))
+
+
+def isStrict(file):
+  """Does a file, relative to appengine/, start with 'use strict'?"""
+  with open('appengine/' + file, encoding='utf-8') as f:
+    return bool(STRICT_REGEX.match(f.read()))
+
+
+def relativeRoot(gameName):
+  """Path from a game's page to appengine/, e.g. "" or "../"."""
+  if gameName == 'pond/docs':
+    return '../'
+  return ''
+
 
-(function() {
+def writeLoader(filename, srcs, preamble=''):
+  """Write a script that loads other scripts in parallel, but runs them in order.
+
+  Args:
+    filename: Path of the loader script.
+    srcs: List of quoted URLs of the scripts to load, relative to the page.
+    preamble: Optional code to run before loading, ending in a blank line.
+  """
+  f = open(filename, 'w')
+  f.write("""%s
+%s(function() {
   var srcs = [
       %s
   ];
-  function loadScript() {
-    var src = srcs.shift();
-    if (src) {
-      var script = document.createElement('script');
-      script.src = src;
-      script.type = 'text/javascript';
-      script.onload = loadScript;
-      document.head.appendChild(script);
-    }
+  // Download in parallel, but execute in order.
+  for (var i = 0; i < srcs.length; i++) {
+    var script = document.createElement('script');
+    script.src = srcs[i];
+    script.type = 'text/javascript';
+    script.async = false;
+    document.head.appendChild(script);
   }
-  loadScript();
 })();
-""" % (WARNING, ',\n      '.join(srcs)))
+""" % (WARNING, preamble, ',\n      '.join(srcs)))
   f.close()
-  print('Found %d dependencies.' % len(srcs))
+
+
+def writeHashed(directory, prefix, script):
+  """Write a script to a file named after a hash of its contents.
+
+  Since the contents of such a file never change, it may be cached forever.
+
+  Args:
+    directory: Directory to write to.
+    prefix: Start of the file name, e.g. "common".
+    script: Code to write.
+
+  Returns:
+    Path of the file.
+  """
+  script = WARNING + script
+  digest = hashlib.sha1(script.encode('utf-8')).hexdigest()[:16]
+  filename = '%s/%s-%s.js' % (directory, prefix, digest)
+  if not os.path.exists(filename):
+    os.makedirs(directory, exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as f:
+      f.write(script)
+  return filename
+
+
+def generate_dev_bundle(files):
+  """Concatenate some library files into one script with a source map.
+
+  Games that share the same libraries share the same bundle.  The first
+  file's directives apply to the whole bundle, so the files should either
+  all be strict or all not be.
+
+  Args:
+    files: List of paths relative to appengine/, in dependency order.
+
+  Returns:
+    Path of the bundle relative to appengine/.
+  """
+  sources = []
+  hasher = hashlib.sha1()
+  for file in files:
+    with open('appengine/' + file, encoding='utf-8') as f:
+      code = f.read()
+    sources.append(code)
+    hasher.update(file.encode('utf-8') + b'\0')
+    hasher.update(hashlib.sha1(code.encode('utf-8')).digest())
+  name = 'dev-%s.js' % hasher.hexdigest()[:16]
+  bundlePath = '%s/%s' % (DEV_BUNDLE_DIR, name)
+  if os.path.exists(bundlePath):
+    return bundlePath[len('appengine/'):]
+
+  lines = [WARNING.rstrip('\n')]
+  mappings = ['']
+  previous = [0, 0]  # Source index and line of the previous mapping.
+  for (index, code) in enumerate(sources):
+    codeLines = code.split('\n')
+    if codeLines[-1] == '':
+      codeLines.pop()
+    for (number, line) in enumerate(codeLines):
+      lines.append(line)
+      mappings.append('A' + encodeVlq(index - previous[0]) +
+                      encodeVlq(number - previous[1]) + 'A')
+      previous = [index, number]
+    # End any statement that relies on automatic semicolon insertion.
+    lines.append(';')
+    mappings.append('')
+  lines.append('//# sourceMappingURL=%s.map' % name)
+  sourceMap = {
+    'version': 3,
+    'file': name,
+    # Relative to the bundle's directory, appengine/common/generated/.
+    'sources': ['../../' + file for file in files],
+    'names': [],
+    'mappings': ';'.join(mappings),
+  }
+
+  # Games are compressed in parallel, so replace the files atomically.
+  os.makedirs(DEV_BUNDLE_DIR, exist_ok=True)
+  tmpSuffix = '.%d.tmp' % os.getpid()
+  with open(bundlePath + '.map' + tmpSuffix, 'w', encoding='utf-8') as f:
+    json.dump(sourceMap, f)
+  os.replace(bundlePath + '.map' + tmpSuffix, bundlePath + '.map')
+  with open(bundlePath + tmpSuffix, 'w', encoding='utf-8') as f:
+    f.write('\n'.join(lines) + '\n')
+  os.replace(bundlePath + tmpSuffix, bundlePath)
+  return bundlePath[len('appengine/'):]
+
+
+def removeStaleBundles():
+  """Delete the shared bundles and chunks that no game loads any more.
+
+  Games may be compressed one at a time, so the loaders of every game are
+  checked, not just those of the games in this run.  The caller must hold
+  BUNDLE_LOCK exclusively, so no other run is between writing a bundle and
+  its loader.
+  """
+  referenced = set()
+  for pattern in LOADERS:
+    for loader in glob.glob(pattern):
+      with open(loader, encoding='utf-8') as f:
+        referenced.update(BUNDLE_REF_REGEX.findall(f.read()))
+  paths = [path for pattern in BUNDLES for path in glob.glob(pattern)]
+  for path in paths:
+    if path[len('appengine/'):] not in referenced:
+      os.remove(path)
+      if os.path.exists(path + '.map'):
+        os.remove(path + '.map')
+      print('Removed %s.' % path)
+
+
+def encodeVlq(value):
+  """Encode an integer as a base 64 VLQ, as used by source maps."""
+  value = (-value << 1) | 1 if value < 0 else value << 1
+  digits = ''
+  while True:
+    digit = value & 31
+    value >>= 5
+    if value:
+      digit |= 32
+    digits += VLQ_DIGITS[digit]
+    if not value:
+      return digits
 
 
 def generate_compressed(gameName):
-  cmd = [
-    'java',
-    '-jar', 'build/third-party-downloads/closure-compiler.jar',
-    '--generate_exports',
-    '--compilation_level', 'ADVANCED_OPTIMIZATIONS',
-    '--dependency_mode=PRUNE',
-    '--externs', 'externs/interpreter-externs.js',
-    '--externs', 'externs/prettify-externs.js',
-    '--externs', 'externs/soundJS-externs.js',
-    '--externs', 'externs/storage-externs.js',
-    '--externs', 'externs/svg-externs.js',
-    #'--language_in', 'STABLE',
-    '--language_out', 'ECMASCRIPT5',
+  cmd = COMPILER + [
     '--entry_point=appengine/%s/src/main' % gameName,
     "--js='appengine/third-party/base.js'",
     "--js='appengine/third-party/blockly/**.js'",
     "--js='appengine/src/*.js'",
-    '--warning_level', 'QUIET',
   ]
-  directory = gameName
-  while directory:
+  for directory in gameDirectories(gameName):
     cmd.append("--js='appengine/%s/src/*.js'" % directory)
-    (directory, sep, fragment) = directory.rpartition(os.path.sep)
   try:
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
   except:
@@ -228,6 +719,81 @@ def generate_compressed(gameName):
   f.write(script)
   f.close()
 
+def generate_chunked(gameNames):
+  """Compile several games in a single Closure Compiler run.
+
+  Each game is a chunk that depends on a common chunk holding the shared
+  sources, so the JVM starts once and those sources are only parsed once.
+  The compiler moves any code that two or more games need into the common
+  chunk.  Each chunk is written to a file named after a hash of its contents,
+  and each game's compressed.js loads the common chunk and then its own.
+  So moving between games only downloads the small per-game chunk.
+
+  Args:
+    gameNames: List of game names, e.g. "maze" or "pond/duck".
+
+  Returns:
+    Dictionary of each game's chunk files, relative to appengine/.
+  """
+  print('Compiling %d games in one run.' % len(gameNames))
+  sharedFiles = sorted(glob.glob('appengine/third-party/blockly/**/*.js',
+                                 recursive=True))
+  sharedFiles = (['appengine/third-party/base.js'] + sharedFiles +
+                 sorted(glob.glob('appengine/src/*.js')))
+  gameFiles = {}
+  for gameName in gameNames:
+    gameFiles[gameName] = []
+    for directory in gameDirectories(gameName):
+      gameFiles[gameName] += sorted(glob.glob('appengine/%s/src/*.js' % directory))
+  # Sources of a parent directory (e.g. pond) may be shared by several games.
+  uses = collections.Counter(path for gameName in gameNames
+                             for path in set(gameFiles[gameName]))
+  commonFiles = sharedFiles + sorted(path for path in uses if uses[path] > 1)
+
+  # Chunk outputs are written to stdout as a JSON array.
+  cmd = COMPILER + ['--json_streams', 'OUT']
+  cmd += ['--js=%s' % path for path in commonFiles]
+  cmd += ['--chunk', 'common:%d' % len(commonFiles)]
+  for gameName in gameNames:
+    ownFiles = [path for path in gameFiles[gameName] if uses[path] == 1]
+    cmd.append('--entry_point=appengine/%s/src/main' % gameName)
+    cmd += ['--js=%s' % path for path in ownFiles]
+    cmd += ['--chunk', '%s:%d:common' % (chunkName(gameName), len(ownFiles))]
+  try:
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+  except:
+    print("Failed to Popen: %s" % cmd)
+    raise
+  chunks = {}
+  for output in json.loads(''.join(readStdout(proc))):
+    name = os.path.splitext(os.path.basename(output['path']))[0]
+    chunks[name] = output['src']
+
+  script = trim_licence(chunks['common'])
+  print('Compressed common chunk to %d KB.' % (len(script) / 1024))
+  commonFile = writeHashed(DEV_BUNDLE_DIR, 'common', script)
+  files = {}
+  for gameName in gameNames:
+    generatedDir = 'appengine/%s/generated' % gameName
+    if not os.path.exists(generatedDir):
+      os.mkdir(generatedDir)
+    script = trim_licence(chunks[chunkName(gameName)])
+    print('Compressed %s to %d KB.' % (gameName.title(), len(script) / 1024))
+    gameFile = writeHashed(generatedDir, 'chunk', script)
+    files[gameName] = [path[len('appengine/'):]
+                       for path in (commonFile, gameFile)]
+    path = relativeRoot(gameName)
+    writeLoader('%s/compressed.js' % generatedDir,
+                ['"%s%s"' % (path, file) for file in files[gameName]])
+  print('')
+  return files
+
+
+def chunkName(gameName):
+  """Name of a game's chunk, e.g. "pond-duck"."""
+  return gameName.replace('/', '-')
+
+
 def trim_licence(code):
   """Strip out Google's and MIT's Apache licences.
 
@@ -252,6 +818,13 @@ def trim_licence(code):
 
 def readStdout(proc):
   data = proc.stdout.readlines()
+  # Wait for the tool to exit, and record the resources it used.
+  (pid, status, usage) = os.wait4(proc.pid, 0)
+  proc.returncode = os.waitstatus_to_exitcode(status)
+  toolUsages.append(usage)
+  if proc.returncode:
+    raise Exception('"%s" failed with exit code %d.' %
+                    (' '.join(proc.args), proc.returncode))
   # Python 2 reads stdout as text.
   # Python 3 reads stdout as bytes.
   return list(map(lambda line:
@@ -259,8 +832,4 @@ def readStdout(proc):
 
 
 if __name__ == '__main__':
-  if len(sys.argv) == 2:
-    main(sys.argv[1])
-  else:
-    print('Format: %s <appname>' % sys.argv[0])
-    sys.exit(2)
+  main()
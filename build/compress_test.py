@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# Tests for compress.py.
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Usage: python build/compress_test.py
+
+import unittest
+
+import compress
+
+
+class GetTokensTest(unittest.TestCase):
+
+  def testQuotedName(self):
+    tokens = compress.getTokens('a=BlocklyGames.getMsg("Maze.moveForward",!1);')
+    self.assertIn('"Maze.moveForward"', tokens)
+
+  def testStrayQuote(self):
+    # A quote in a regex literal must not hide the names after it.
+    tokens = compress.getTokens('a.replace(/"/g,"&quot;");'
+                                'b=BlocklyGames.getMsg("Maze.moveForward",!1);')
+    self.assertIn('"Maze.moveForward"', tokens)
+    tokens = compress.getTokens('''a='"';b="CONTROLS_IF_MSG_IF";''')
+    self.assertIn('"CONTROLS_IF_MSG_IF"', tokens)
+
+  def testProperties(self):
+    tokens = compress.getTokens('a=BlocklyGamesMsg.Games.name;')
+    self.assertIn('.Games.name', tokens)
+    self.assertIn('.name', tokens)
+
+  def testBlocklyReference(self):
+    tokens = compress.getTokens('a="%{BKY_CONTROLS_IF_MSG_IF} x";')
+    self.assertIn('%{BKY_CONTROLS_IF_MSG_IF}', tokens)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# Gives the generated files of one or more games content-based names.
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Run this after compress.py.  For each game it writes:
+#   <game>/generated/compressed-<hash>.js
+#   <game>/generated/msg/<lang>-<hash>.js
+#     Copies of compressed.js and of each message file, named after a hash
+#     of their contents.
+#   <game>/generated/boot-<hash>.js
+#     A copy of common/boot.js that loads the files above.
+#   generated/html/<page>.html
+#     A copy of the game's page that loads the boot script above.
+# Since the content-named files never change, app.yaml serves them with a
+# one year expiry.  Only the pages need to be fetched again after a release.
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+
+
+if sys.version_info[0] < 3:
+    raise Exception("Must be using Python 3")
+
+# Script that loads each page's language pack and code bundle.
+BOOT = 'appengine/common/boot.js'
+
+# Directory of the rewritten pages.
+HTML_DIR = 'appengine/generated/html'
+
+# Length of the hash in a content-based name.
+HASH_LENGTH = 16
+
+# Matches the content-based name of a file, e.g. "en-0123456789abcdef.js".
+HASHED_REGEX = re.compile(r'-[0-9a-f]{%d}\.js$' % HASH_LENGTH)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Give the generated files of games content-based names.')
+  parser.add_argument('games', nargs='+', metavar='game',
+                      help='Game to fingerprint, e.g. "maze" or "pond/duck".')
+  args = parser.parse_args()
+
+  with open(BOOT, encoding='utf-8') as f:
+    boot = f.read()
+  os.makedirs(HTML_DIR, exist_ok=True)
+  for gameName in args.games:
+    fingerprintGame(gameName, boot)
+
+
+def fingerprintGame(gameName, boot):
+  """Write the content-named files and the rewritten page of one game.
+
+  Args:
+    gameName: Name of the game, e.g. "maze" or "pond/duck".
+    boot: Source of common/boot.js.
+  """
+  generatedDir = 'appengine/%s/generated' % gameName
+  files = ['compressed.js']
+  files += sorted(os.path.relpath(path, generatedDir)
+                  for path in glob.glob('%s/msg/*.js' % generatedDir)
+                  if not HASHED_REGEX.search(path))
+  # Map each file to its copy, relative to the generated directory.
+  assets = {}
+  for file in files:
+    with open('%s/%s' % (generatedDir, file), 'rb') as f:
+      assets[file] = writeHashed(generatedDir, file, f.read())
+
+  # The boot script must set the names before it runs.
+  manifest = ("window['BlocklyGamesAssets'] = %s;\n" %
+              json.dumps(assets, sort_keys=True, separators=(',', ':')))
+  directive = "'use strict';\n"
+  if directive in boot:
+    (head, sep, tail) = boot.partition(directive)
+    gameBoot = head + sep + manifest + tail
+  else:
+    gameBoot = manifest + boot
+  bootFile = writeHashed(generatedDir, 'boot.js', gameBoot.encode('utf-8'))
+
+  page = '%s.html' % gameName.replace('/', '-')
+  with open('appengine/%s' % page, encoding='utf-8') as f:
+    html = f.read()
+  reference = 'src="common/boot.js"'
+  if reference not in html:
+    raise Exception('"%s" does not load common/boot.js.' % page)
+  html = html.replace(reference,
+                      'src="%s/generated/%s"' % (gameName, bootFile))
+  with open('%s/%s' % (HTML_DIR, page), 'w', encoding='utf-8') as f:
+    f.write(html)
+
+  removeStale(generatedDir, set(assets.values()) | {bootFile})
+  print('Fingerprinted %s: %d files.' % (gameName.title(), len(assets) + 1))
+
+
+def writeHashed(directory, file, contents):
+  """Write a copy of a file named after a hash of its contents.
+
+  Args:
+    directory: Directory the file name is relative to.
+    file: Name of the file, e.g. "msg/en.js".
+    contents: Bytes to write.
+
+  Returns:
+    Name of the copy, e.g. "msg/en-0123456789abcdef.js".
+  """
+  digest = hashlib.sha1(contents).hexdigest()[:HASH_LENGTH]
+  (root, ext) = os.path.splitext(file)
+  hashedFile = '%s-%s%s' % (root, digest, ext)
+  path = '%s/%s' % (directory, hashedFile)
+  if not os.path.exists(path):
+    with open(path, 'wb') as f:
+      f.write(contents)
+  return hashedFile
+
+
+def removeStale(directory, current):
+  """Delete content-named files left over from previous builds.
+
+  Chunk files are left to compress.py, which deletes the stale ones.
+
+  Args:
+    directory: A game's generated directory.
+    current: Set of the names of this build's copies.
+  """
+  for pattern in ('compressed-*.js', 'boot-*.js', 'msg/*.js'):
+    for path in glob.glob('%s/%s' % (directory, pattern)):
+      file = os.path.relpath(path, directory)
+      if HASHED_REGEX.search(file) and file not in current:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+  main()
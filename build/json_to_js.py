@@ -18,9 +18,12 @@
 
 import argparse
 import codecs
+import concurrent.futures
 import glob
+import hashlib
 import json
 import os
+import pickle
 import re
 import sys
 
@@ -45,6 +48,17 @@ def main():
   parser.add_argument('--output_dir',
                       default=os.path.join('appengine', 'generated', 'msg'),
                       help='Relative directory for output .js files.')
+  parser.add_argument('--store_dir',
+                      default=os.path.join('build', 'generated', 'msg'),
+                      help='Relative directory for the parsed message store '
+                      'read by compress.py.')
+  parser.add_argument('--boot_file',
+                      default=os.path.join('appengine', 'common', 'boot.js'),
+                      help='File listing the languages supported by the games.')
+  parser.add_argument('--force', action='store_true',
+                      help='Convert every language, even if unchanged.')
+  parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='Number of languages to convert in parallel.')
   args = parser.parse_args()
   if not args.blockly_msg_dir.endswith(os.path.sep):
     args.blockly_msg_dir += os.path.sep
@@ -53,15 +67,28 @@ def main():
   if not args.output_dir.endswith(os.path.sep):
     args.output_dir += os.path.sep
   os.makedirs(args.output_dir, exist_ok=True)
-
-  blockly_constants_data = read_json_file(args.blockly_msg_dir, 'constants')
-  blockly_synonyms_data = read_json_file(args.blockly_msg_dir, 'synonyms')
-  blockly_default_data = read_json_file(args.blockly_msg_dir, args.default_lang)
-  bg_default_data = read_json_file(args.blocklygames_msg_dir, args.default_lang)
+  os.makedirs(args.store_dir, exist_ok=True)
+
+  # Every language falls back to these files, so they are part of each hash.
+  shared_files = [
+    __file__,
+    os.path.join(args.blockly_msg_dir, 'constants.json'),
+    os.path.join(args.blockly_msg_dir, 'synonyms.json'),
+    os.path.join(args.blockly_msg_dir, args.default_lang + '.json'),
+    os.path.join(args.blocklygames_msg_dir, args.default_lang + '.json'),
+  ]
+  shared_hash = hash_files(shared_files)
+  hashes_file = os.path.join(args.store_dir, 'hashes.json')
+  try:
+    with open(hashes_file) as f:
+      old_hashes = json.load(f)
+  except (IOError, ValueError):
+    old_hashes = {}
 
   language_files = glob.glob(os.path.join(args.blocklygames_msg_dir, '*.json'))
   language_files.sort()
   languages = []
+  hashes = {}
   for language_file in language_files:
     language = re.search(r'([\w-]+)\.json$', language_file)[1]
     if language == 'qqq':
@@ -70,56 +97,109 @@ def main():
       # Need both the Blockly Games and Blockly message files.
       continue
     languages.append(language)
-
-    output_file = codecs.open(os.path.join(args.output_dir, language + '.js'), 'w', 'utf-8')
-    output_file.write('''// This file was automatically generated.  Do not modify.
+    hashes[language] = hash_files([
+        os.path.join(args.blockly_msg_dir, language + '.json'),
+        os.path.join(args.blocklygames_msg_dir, language + '.json'),
+    ], shared_hash)
+
+  # Only convert languages whose inputs have changed or outputs are missing.
+  stale = [language for language in languages
+           if args.force or old_hashes.get(language) != hashes[language] or
+           not os.path.isfile(os.path.join(args.output_dir, language + '.js')) or
+           not os.path.isfile(os.path.join(args.store_dir, language + '.pickle'))]
+  if stale:
+    blockly_constants_data = read_json_file(args.blockly_msg_dir, 'constants')
+    blockly_synonyms_data = read_json_file(args.blockly_msg_dir, 'synonyms')
+    blockly_default_data = read_json_file(args.blockly_msg_dir, args.default_lang)
+    bg_default_data = read_json_file(args.blocklygames_msg_dir, args.default_lang)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+      futures = [pool.submit(convert_language, args, language,
+                             blockly_constants_data, blockly_synonyms_data,
+                             blockly_default_data, bg_default_data)
+                 for language in stale]
+      for future in futures:
+        future.result()
+
+  with open(hashes_file, 'w') as f:
+    json.dump(hashes, f)
+  print('Generated message js files for: ' + str(stale))
+  print('Unchanged message js files: %d' % (len(languages) - len(stale)))
+
+  # Record which languages the games ship, for compress.py.
+  supported = [language for language in read_supported_languages(args.boot_file)
+               if language in languages]
+  write_pickle_file(args.store_dir, 'index', {'languages': supported})
+
+
+def convert_language(args, language, blockly_constants_data,
+                     blockly_synonyms_data, blockly_default_data,
+                     bg_default_data):
+  """Write the .js message file and message store entry for one language."""
+  lines = ['''// This file was automatically generated.  Do not modify.
 
 'use strict';
 var BlocklyMsg = {};
 var BlocklyGamesMsg = {};
 
-''')
-
-    # Write the Blockly messages.
-    blockly_language_data = read_json_file(args.blockly_msg_dir, language)
-    blockly_msg_dict = {}
-    for (name, default_message) in blockly_default_data.items():
-      if name in blockly_language_data:
-        message_str = blockly_language_data[name]
-        comment = ''
-      else:
-        message_str = default_message
-        comment = '  // untranslated'
-      message_str = scrub_message(message_str)
-      blockly_msg_dict[name] = message_str
-      output_file.write('BlocklyMsg["%s"] = "%s";%s\n' % (name, message_str, comment))
-    output_file.write('\n')
-    for (name, alias_name) in blockly_synonyms_data.items():
-      blockly_msg_dict[name] = blockly_msg_dict[alias_name]
-      output_file.write('BlocklyMsg["%s"] = "%s";\n' % (name, blockly_msg_dict[alias_name]))
-    output_file.write('\n')
-    for (name, message_str) in blockly_constants_data.items():
-      message_str = scrub_message(message_str)
-      blockly_msg_dict[name] = message_str
-      output_file.write('BlocklyMsg["%s"] = "%s";\n' % (name, message_str))
-
-    output_file.write('\n')
-
-    # Write the Blockly Games messages.
-    bg_language_data = read_json_file(args.blocklygames_msg_dir, language)
-    for (name, default_message) in bg_default_data.items():
-      if name in bg_language_data:
-        message_str = bg_language_data[name]
-        comment = ''
-      else:
-        message_str = default_message
-        comment = '  // untranslated'
-      message_str = scrub_message(message_str)
-      output_file.write('BlocklyGamesMsg["%s"] = "%s";%s\n' % (name, message_str, comment))
-
-    output_file.close()
-
-  print('Generated message js files for: ' + str(languages))
+''']
+  # Each message as a JavaScript string literal, for the message store.
+  store = {'BlocklyMsg': {}, 'BlocklyGamesMsg': {}}
+
+  # Write the Blockly messages.
+  blockly_language_data = read_json_file(args.blockly_msg_dir, language)
+  blockly_msg_dict = {}
+  for (name, default_message) in blockly_default_data.items():
+    if name in blockly_language_data:
+      message_str = blockly_language_data[name]
+      comment = ''
+    else:
+      message_str = default_message
+      comment = '  // untranslated'
+    message_str = scrub_message(message_str)
+    blockly_msg_dict[name] = message_str
+    store['BlocklyMsg'][name] = '"%s"' % message_str
+    lines.append('BlocklyMsg["%s"] = "%s";%s\n' % (name, message_str, comment))
+  lines.append('\n')
+  for (name, alias_name) in blockly_synonyms_data.items():
+    blockly_msg_dict[name] = blockly_msg_dict[alias_name]
+    store['BlocklyMsg'][name] = '"%s"' % blockly_msg_dict[alias_name]
+    lines.append('BlocklyMsg["%s"] = "%s";\n' % (name, blockly_msg_dict[alias_name]))
+  lines.append('\n')
+  for (name, message_str) in blockly_constants_data.items():
+    message_str = scrub_message(message_str)
+    blockly_msg_dict[name] = message_str
+    store['BlocklyMsg'][name] = '"%s"' % message_str
+    lines.append('BlocklyMsg["%s"] = "%s";\n' % (name, message_str))
+
+  lines.append('\n')
+
+  # Write the Blockly Games messages.
+  bg_language_data = read_json_file(args.blocklygames_msg_dir, language)
+  for (name, default_message) in bg_default_data.items():
+    if name in bg_language_data:
+      message_str = bg_language_data[name]
+      comment = ''
+    else:
+      message_str = default_message
+      comment = '  // untranslated'
+    message_str = scrub_message(message_str)
+    store['BlocklyGamesMsg'][name] = '"%s"' % message_str
+    lines.append('BlocklyGamesMsg["%s"] = "%s";%s\n' % (name, message_str, comment))
+
+  # Write the whole file at once.
+  output_file = codecs.open(os.path.join(args.output_dir, language + '.js'), 'w', 'utf-8')
+  output_file.write(''.join(lines))
+  output_file.close()
+  write_pickle_file(args.store_dir, language, store)
+
+
+def hash_files(paths, seed=''):
+  """Hash the contents of some files, combined with an optional seed."""
+  hasher = hashlib.sha1(seed.encode('utf-8'))
+  for path in paths:
+    with open(path, 'rb') as f:
+      hasher.update(hashlib.sha1(f.read()).digest())
+  return hasher.hexdigest()
 
 
 def scrub_message(msg):
@@ -130,6 +210,23 @@ def scrub_message(msg):
   return msg
 
 
+def read_supported_languages(boot_file):
+  """Extract the list of languages supported by the games from boot.js."""
+  boot = codecs.open(boot_file, 'r', 'utf-8')
+  js = boot.read()
+  boot.close()
+  m = re.search(r'\[\'BlocklyGamesLanguages\'\] = (\[[^\]]*\])', js)
+  if not m:
+    raise Exception("Can't find BlocklyGamesLanguages in %s" % boot_file)
+  return json.loads(m.group(1).replace("'", '"'))
+
+
+def write_pickle_file(dir, name, data):
+  pickle_file = open(os.path.join(dir, name + '.pickle'), 'wb')
+  pickle.dump(data, pickle_file, pickle.HIGHEST_PROTOCOL)
+  pickle_file.close()
+
+
 def read_json_file(dir, isoCode):
   json_file = codecs.open(os.path.join(dir, isoCode + '.json'), 'r', 'utf-8')
   data = json.load(json_file)
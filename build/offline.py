@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# Packages Blockly Games into a zip file that runs offline from the disk.
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Run this after the games have been compressed.  The files of appengine/
+# that work offline are read straight into blockly-games/ in the zip, along
+# with a blockly-games.html page that opens the index.  Server code, sources,
+# uncompressed code and the unused parts of the third-party libraries are
+# left out.
+# Files are compressed in parallel.  Media that is already compressed is
+# stored as is.  Entries are sorted and have fixed dates and permissions, so
+# the same inputs always produce the same zip.
+
+import argparse
+import concurrent.futures
+import os
+import re
+import struct
+import sys
+import zlib
+
+
+if sys.version_info[0] < 3:
+    raise Exception("Must be using Python 3")
+
+# Paths relative to appengine/ that are not packaged.
+EXCLUDE = [
+  # Server configuration and code.
+  r'^[^/]+\.(yaml|py|sh)$',
+  r'(^|/)__pycache__/',
+  r'\.py[co]$',
+  r'^(admin\.html|apple-touch-icon\.png|favicon\.ico|robots\.txt)$',
+  r'^gallery',
+  # Sources, uncompressed code and copies for serving.
+  r'^generated/',
+  r'^([^/]+/){0,2}src/',
+  r'/generated/uncompressed\.js$',
+  r'^common/generated/dev-',
+  r'/generated/(compressed|boot|msg/[-\w]+)-[0-9a-f]{16}\.js$',
+  r'\.js\.(gz|br)$',
+  # Files only used online.
+  r'^index/title(-beta)?\.png$',
+  r'^pond/crobots\.txt$',
+  r'^pond/battle/',
+  r'^common/stripes\.svg$',
+  r'^third-party/base\.js$',
+  r'^third-party/soundfonts/README\.txt$',
+  # Only the built parts of third-party libraries.
+  r'^third-party/ace/(?!(ace|mode-javascript|theme-chrome|worker-javascript)'
+      r'\.js$)',
+  r'^third-party/SoundJS/(?!soundjs\.min\.js$)',
+  r'^third-party/blockly/(?!media/)',
+  r'^third-party/JS-Interpreter/(?!compressed\.js$)',
+  # Hidden files, such as .DS_Store and .inputs.json.
+  r'(^|/)\.',
+]
+EXCLUDE_REGEX = re.compile('|'.join('(?:%s)' % pattern for pattern in EXCLUDE))
+
+# Extensions of files that are already compressed.
+STORED_EXTENSIONS = {'.gif', '.jpg', '.mp3', '.ogg', '.png'}
+
+# Page in the root of the zip that opens the index.
+REDIRECT = ('<html><head><meta http-equiv=refresh content="0; '
+            'url=blockly-games/index.html"/></head></html>\n')
+
+# MS-DOS date of every entry: 1 January 1980, the earliest possible.
+DOS_DATE = (1 << 5) | 1
+DOS_TIME = 0
+
+# Zip compression methods.
+STORED = 0
+DEFLATED = 8
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Package Blockly Games into a zip file for offline use.')
+  parser.add_argument('--output', default='offline/blockly-games.zip',
+                      help='Path of the zip file to write.')
+  parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='Number of files to compress in parallel.')
+  args = parser.parse_args()
+
+  entries = [('blockly-games.html', REDIRECT.encode('utf-8'))]
+  entries += [('blockly-games/' + path, os.path.join('appengine', path))
+              for path in listFiles('appengine')]
+  entries.sort()
+  # zlib releases the GIL while it compresses, so threads are enough.
+  with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    members = pool.map(compressEntry, entries)
+    directory = os.path.dirname(args.output)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'wb') as f:
+      (count, size) = writeZip(f, members)
+  print('Packaged %d files into %s (%d KB, from %d KB).' %
+        (count, args.output, os.path.getsize(args.output) / 1024,
+         size / 1024))
+
+
+def listFiles(root):
+  """List the files under a directory that are packaged.
+
+  Args:
+    root: Directory to search.
+
+  Returns:
+    Sorted list of paths relative to root, with '/' separators.
+  """
+  paths = []
+  for (dirpath, dirnames, filenames) in os.walk(root):
+    relative = os.path.relpath(dirpath, root).replace(os.sep, '/')
+    for filename in filenames:
+      path = filename if relative == '.' else relative + '/' + filename
+      if not EXCLUDE_REGEX.search(path):
+        paths.append(path)
+  paths.sort()
+  return paths
+
+
+def compressEntry(entry):
+  """Compress the contents of one zip entry.
+
+  Args:
+    entry: Tuple of the name in the zip, and either the path of the file to
+        read or its contents.
+
+  Returns:
+    Tuple of the name, compression method, CRC-32, uncompressed size and
+    the data to write.
+  """
+  (name, source) = entry
+  if isinstance(source, bytes):
+    data = source
+  else:
+    with open(source, 'rb') as f:
+      data = f.read()
+  crc = zlib.crc32(data)
+  if os.path.splitext(name)[1].lower() not in STORED_EXTENSIONS:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    if len(deflated) < len(data):
+      return (name, DEFLATED, crc, len(data), deflated)
+  return (name, STORED, crc, len(data), data)
+
+
+def writeZip(f, members):
+  """Write a zip file.
+
+  Args:
+    f: Binary file to write to.
+    members: Iterable of the tuples returned by compressEntry, in order.
+
+  Returns:
+    Tuple of the number of entries and their total uncompressed size.
+  """
+  central = []
+  offset = 0
+  size = 0
+  for (name, method, crc, fileSize, data) in members:
+    nameBytes = name.encode('utf-8')
+    # Flag bit 11: the name is UTF-8.
+    flags = 0x800 if not name.isascii() else 0
+    header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, flags, method,
+                         DOS_TIME, DOS_DATE, crc, len(data), fileSize,
+                         len(nameBytes), 0)
+    f.write(header)
+    f.write(nameBytes)
+    f.write(data)
+    # Made by Unix, so the external attributes hold a -rw-r--r-- mode.
+    central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50,
+                               (3 << 8) | 20, 20, flags, method, DOS_TIME,
+                               DOS_DATE, crc, len(data), fileSize,
+                               len(nameBytes), 0, 0, 0, 0, 0o100644 << 16,
+                               offset) + nameBytes)
+    offset += len(header) + len(nameBytes) + len(data)
+    size += fileSize
+  centralBytes = b''.join(central)
+  f.write(centralBytes)
+  f.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central),
+                      len(central), len(centralBytes), offset, 0))
+  return (len(central), size)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,197 @@
+#!/usr/bin/python
+# Writes gzip and brotli compressed copies of the generated files of games.
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Run this after compress.py (and fingerprint.py).  Next to each compiled
+# bundle and message file it writes a .gz copy, and a .br copy if the brotli
+# module is installed, both at the maximum compression level.  A server or
+# CDN in front of the files can then send these instead of compressing the
+# same files again on every response.  App Engine can't, so app.yaml does
+# not deploy the copies, and 'make games' does not write them; run
+# 'make precompress'.  Copies that are newer than their file are kept.
+# The content-named copies that fingerprint.py makes of compressed.js and of
+# the message files are identical to them, so they are not compressed again.
+
+import argparse
+import concurrent.futures
+import glob
+import gzip
+import json
+import os
+import sys
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+
+if sys.version_info[0] < 3:
+    raise Exception("Must be using Python 3")
+
+# Directory of the common chunk written by compress.py.
+COMMON_DIR = 'appengine/common/generated'
+
+# Stamp written by compress.py to each game's generated directory.
+STAMP = '.inputs.json'
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Precompress the generated files of one or more games.')
+  parser.add_argument('games', nargs='+', metavar='game',
+                      help='Game to precompress, e.g. "maze" or "pond/duck".')
+  parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='Number of files to compress in parallel.')
+  args = parser.parse_args()
+  if not brotli:
+    print('Brotli module not found, only writing gzip copies.')
+
+  paths = set(glob.glob('%s/common-*.js' % COMMON_DIR))
+  for gameName in args.games:
+    generatedDir = 'appengine/%s/generated' % gameName
+    paths.update(path for path in glob.glob('%s/*.js' % generatedDir)
+                 if os.path.basename(path) != 'uncompressed.js' and
+                 not isCopy(path))
+    paths.update(path for path in glob.glob('%s/msg/*.js' % generatedDir)
+                 if not isCopy(path))
+  with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+    sizes = dict(zip(sorted(paths), pool.map(precompressFile, sorted(paths))))
+
+  removeOrphans([COMMON_DIR] + ['appengine/%s/generated%s' % (gameName, subdir)
+                                for gameName in args.games
+                                for subdir in ('', '/msg')])
+  for gameName in args.games:
+    report(gameName, sizes)
+
+
+def isCopy(path):
+  """True if a file is a content-named copy of another file in its directory.
+
+  E.g. "msg/de-0123456789abcdef.js" is a copy of "msg/de.js", written by
+  fingerprint.py.  Chunk files are named after their contents too, but are
+  the only copy.
+  """
+  (root, ext) = os.path.splitext(path)
+  (name, sep, digest) = root.rpartition('-')
+  return (len(digest) == 16 and all(c in '0123456789abcdef' for c in digest)
+          and os.path.exists(name + ext))
+
+
+def precompressFile(path):
+  """Write the compressed copies of one file, unless they are up to date.
+
+  Args:
+    path: Path of the file.
+
+  Returns:
+    Tuple of the sizes of the file and of its gzip and brotli copies.  The
+    brotli size is None if brotli is not installed.
+  """
+  mtime = os.path.getmtime(path)
+  with open(path, 'rb') as f:
+    data = f.read()
+  gzSize = writeCopy(path + '.gz', mtime,
+                     lambda: gzip.compress(data, compresslevel=9, mtime=0))
+  brSize = None
+  if brotli:
+    brSize = writeCopy(path + '.br', mtime,
+                       lambda: brotli.compress(data, mode=brotli.MODE_TEXT,
+                                               quality=11))
+  return (len(data), gzSize, brSize)
+
+
+def writeCopy(copyPath, mtime, compress):
+  """Write a compressed copy of a file, unless it is newer than the file.
+
+  Args:
+    copyPath: Path of the copy.
+    mtime: Modification time of the file.
+    compress: Function that returns the compressed contents.
+
+  Returns:
+    Size of the copy.
+  """
+  if os.path.exists(copyPath) and os.path.getmtime(copyPath) >= mtime:
+    return os.path.getsize(copyPath)
+  data = compress()
+  with open(copyPath, 'wb') as f:
+    f.write(data)
+  return len(data)
+
+
+def removeOrphans(directories):
+  """Delete compressed copies whose file no longer exists or is skipped.
+
+  Args:
+    directories: List of directories to clean.
+  """
+  for directory in directories:
+    for pattern in ('*.js.gz', '*.js.br'):
+      for copyPath in glob.glob('%s/%s' % (directory, pattern)):
+        path = os.path.splitext(copyPath)[0]
+        if not os.path.exists(path) or isCopy(path):
+          os.remove(copyPath)
+
+
+def report(gameName, sizes):
+  """Print how much smaller one game's compressed copies are.
+
+  The code is the game's compressed.js plus any chunks it loads, which is
+  what a first visit downloads.  Messages are averaged over the languages.
+
+  Args:
+    gameName: Name of the game, e.g. "maze" or "pond/duck".
+    sizes: Dictionary of the sizes returned by precompressFile for each path.
+  """
+  generatedDir = 'appengine/%s/generated' % gameName
+  try:
+    with open('%s/%s' % (generatedDir, STAMP)) as f:
+      chunks = json.load(f).get('chunks', [])
+  except (IOError, ValueError):
+    chunks = []
+  code = ['%s/compressed.js' % generatedDir]
+  code += ['appengine/' + chunk for chunk in chunks]
+  msgs = [path for path in glob.glob('%s/msg/*.js' % generatedDir)
+          if path in sizes]
+  print('%s:' % gameName.title())
+  printSizes('Code', [sizes[path] for path in code if path in sizes], 1)
+  printSizes('Messages per language', [sizes[path] for path in msgs],
+             len(msgs))
+
+
+def printSizes(label, sizes, count):
+  """Print the total size of some files and of their compressed copies.
+
+  Args:
+    label: Description of the files.
+    sizes: List of tuples returned by precompressFile.
+    count: Number to divide the totals by.
+  """
+  if not sizes:
+    return
+  (plain, gz, br) = zip(*sizes)
+  line = '  %s: %.1f KB, gzip %.1f KB (%d%% smaller)' % (
+      label, sum(plain) / 1024 / count, sum(gz) / 1024 / count,
+      100 - 100 * sum(gz) // max(sum(plain), 1))
+  if brotli:
+    line += ', brotli %.1f KB (%d%% smaller)' % (
+        sum(br) / 1024 / count, 100 - 100 * sum(br) // max(sum(plain), 1))
+  print(line + '.')
+
+
+if __name__ == '__main__':
+  main()
@@ -31,12 +31,16 @@ usage: %prog [options] [file1.js file2.js ...]
 __author__ = 'nnaze@google.com (Nathan Naze)'
 
 
+import concurrent.futures
+import functools
 import io
 import logging
 import optparse
 import os
+import re
 import sys
 
+import depscache
 import depstree
 import source
 import treescan
@@ -77,6 +81,24 @@ def _GetOptionsParser():
                     dest='excludes',
                     action='append',
                     help='Files to exclude from the --root flag.')
+  parser.add_option('--exclude_pattern',
+                    dest='exclude_patterns',
+                    action='append',
+                    default=[],
+                    help='Regular expressions of the files to exclude from '
+                    'the --root flag.')
+  parser.add_option('--cache_file',
+                    dest='cache_file',
+                    action='store',
+                    help='If specified, reuse the provides and requires of '
+                    'unchanged files scanned by previous runs, as recorded '
+                    'in this file.')
+  parser.add_option('-j',
+                    '--jobs',
+                    dest='jobs',
+                    type='int',
+                    help='Number of threads reading and scanning sources.  '
+                    'Defaults to a few more than the number of CPUs.')
   parser.add_option('--output_file',
                     dest='output_file',
                     action='store',
@@ -86,37 +108,53 @@ def _GetOptionsParser():
   return parser
 
 
-def _GetInputByPath(path, sources):
+class _SourceIndex(object):
+  """Sources indexed by real path and by provided namespace."""
+
+  def __init__(self, sources):
+    """Index a set of sources.
+
+    Args:
+      sources: An iterable of _PathSource objects.
+    """
+    self.by_path = dict()
+    self.by_namespace = dict()
+    for js_source in sources:
+      self.by_path[os.path.realpath(js_source.GetPath())] = js_source
+      for namespace in js_source.provides:
+        self.by_namespace.setdefault(namespace, []).append(js_source)
+
+
+def _GetInputByPath(path, source_index):
   """Get the source identified by a path.
 
   Args:
     path: str, A path to a file that identifies a source.
-    sources: An iterable collection of source objects.
+    source_index: A _SourceIndex of the source objects.
 
   Returns:
-    The source from sources identified by path, if found.  Converts to
-    real paths for comparison.
+    The source identified by path, if found.  Converts to real paths for
+    comparison.
   """
-  for js_source in sources:
-    # Convert both to real paths for comparison.
-    if os.path.realpath(path) == os.path.realpath(js_source.GetPath()):
-      return js_source
+  return source_index.by_path.get(os.path.realpath(path))
 
 
-def _GetClosureBaseFile(sources):
+def _GetClosureBaseFile(source_index):
   """Given a set of sources, returns the one base.js file.
 
   Note that if zero or two or more base.js files are found, an error message
   will be written and the program will be exited.
 
   Args:
-    sources: An iterable of _PathSource objects.
+    source_index: A _SourceIndex of the _PathSource objects.
 
   Returns:
     The _PathSource representing the base Closure file.
   """
+  # A base file provides exactly 'goog'.
   base_files = [
-      js_source for js_source in sources if _IsClosureBaseFile(js_source)
+      js_source for js_source in source_index.by_namespace.get('goog', [])
+      if _IsClosureBaseFile(js_source)
   ]
 
   if not base_files:
@@ -139,16 +177,29 @@ def _IsClosureBaseFile(js_source):
 class _PathSource(source.Source):
   """Source file subclass that remembers its file path."""
 
-  def __init__(self, path):
+  def __init__(self, path, deps_cache=None):
     """Initialize a source.
 
     Args:
       path: str, Path to a JavaScript file.  The source string will be read
         from this file.
+      deps_cache: An optional depscache.DepsCache.  If the file's scan is
+        cached, the file is not scanned (and may not even be read).
     """
-    super(_PathSource, self).__init__(source.GetFileContents(path))
-
     self._path = path
+    if not deps_cache:
+      super(_PathSource, self).__init__(source.GetFileContents(path))
+      return
+
+    entry, contents = deps_cache.Lookup(path)
+    if entry:
+      self.provides = set(entry['provides'])
+      self.requires = set(entry['requires'])
+      self.is_goog_module = entry['is_goog_module']
+      self._source = contents
+    else:
+      super(_PathSource, self).__init__(contents)
+      deps_cache.Update(path, self)
 
   def __str__(self):
     return 'PathSource %s' % self._path
@@ -157,6 +208,12 @@ class _PathSource(source.Source):
     """Returns the path."""
     return self._path
 
+  def GetSource(self):
+    """Get the source as a string, reading the file if it was cached."""
+    if self._source is None:
+      self._source = source.GetFileContents(self._path)
+    return self._source
+
 
 def _WrapGoogModuleSource(src):
   return (u'goog.loadModule(function(exports) {{'
@@ -184,28 +241,47 @@ def main():
     out = sys.stdout
 
   sources = set()
-
+  deps_cache = None
+  if options.cache_file:
+    deps_cache = depscache.DepsCache(options.cache_file)
+
+  exclude_regexes = [re.compile(pattern)
+                     for pattern in options.exclude_patterns]
+
+  def _GetJsPaths():
+    for path in options.roots:
+      for js_path in treescan.ScanTreeForJsFiles(path):
+        if options.excludes and js_path in options.excludes:
+          continue
+        if any(regex.search(js_path) for regex in exclude_regexes):
+          continue
+        yield js_path
+
+    # Add scripts specified on the command line.
+    for js_path in args:
+      yield js_path
+
+  # Reading and scanning is mostly waiting on disk, so scan in a thread pool.
+  # Paths are handed to the pool as the tree walk finds them.
   logging.info('Scanning paths...')
-  for path in options.roots:
-    for js_path in treescan.ScanTreeForJsFiles(path):
-      if not options.excludes or js_path not in options.excludes:
-        sources.add(_PathSource(js_path))
-
-  # Add scripts specified on the command line.
-  for js_path in args:
-    sources.add(_PathSource(js_path))
+  with concurrent.futures.ThreadPoolExecutor(options.jobs) as executor:
+    sources.update(executor.map(
+        functools.partial(_PathSource, deps_cache=deps_cache), _GetJsPaths()))
 
   logging.info('%s sources scanned.', len(sources))
+  if deps_cache:
+    deps_cache.Save(options.roots)
 
   # Though deps output doesn't need to query the tree, we still build it
   # to validate dependencies.
   logging.info('Building dependency tree..')
   tree = depstree.DepsTree(sources)
 
+  source_index = _SourceIndex(sources)
   input_namespaces = set()
   inputs = options.inputs or []
   for input_path in inputs:
-    js_input = _GetInputByPath(input_path, sources)
+    js_input = _GetInputByPath(input_path, source_index)
     if not js_input:
       logging.error('No source matched input %s', input_path)
       sys.exit(1)
@@ -219,8 +295,8 @@ def main():
     sys.exit(2)
 
   # The Closure Library base file must go first.
-  base = _GetClosureBaseFile(sources)
-  deps = [base] + tree.GetDependencies(input_namespaces)
+  base = _GetClosureBaseFile(source_index)
+  deps = [base] + tree.GetDependencies(sorted(input_namespaces))
 
   out.writelines([js_source.GetPath() + '\n' for js_source in deps])
 
@@ -0,0 +1,137 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Persistent cache of the namespaces each JavaScript file provides.
+
+Scanning a source means reading it and running several regexes over it.
+The results are cached on disk, keyed by path.  A file whose modification
+time and size are unchanged is not read at all.  A file that was touched
+but whose contents hash the same is read but not rescanned.
+"""
+
+import hashlib
+import json
+import os
+
+# Bump this whenever source.Source scans differently.
+_CACHE_VERSION = 1
+
+
+class DepsCache(object):
+  """Scan results of JavaScript files, persisted to a JSON file.
+
+  Lookup and Update may be called from several threads at once, as long as
+  each path is only handled by one of them.
+  """
+
+  def __init__(self, cache_path):
+    """Load a cache.
+
+    Args:
+      cache_path: str, Path to the cache file.  A missing, unreadable, or
+        outdated file yields an empty cache.
+    """
+    self._cache_path = cache_path
+    self._entries = {}
+    self._dirty = False
+    # Paths looked up by this run.
+    self._used = set()
+    try:
+      with open(cache_path) as cache_file:
+        data = json.load(cache_file)
+      if data.get('version') == _CACHE_VERSION:
+        self._entries = data['entries']
+    except (IOError, OSError, ValueError):
+      pass
+
+  def Lookup(self, path):
+    """Find the cached scan of a file.
+
+    Args:
+      path: str, Path to a JavaScript file.
+
+    Returns:
+      A tuple of the cache entry (None if the file must be rescanned) and the
+      file's contents (None if the file did not need to be read).  An entry
+      is a dict with 'provides', 'requires', and 'is_goog_module' keys.
+    """
+    self._used.add(path)
+    stat = os.stat(path)
+    entry = self._entries.get(path)
+    if (entry and entry['mtime'] == stat.st_mtime_ns and
+        entry['size'] == stat.st_size):
+      return (entry, None)
+
+    with open(path, 'rb') as js_file:
+      data = js_file.read()
+    contents = data.decode('utf-8-sig')
+    digest = hashlib.sha1(data).hexdigest()
+    if entry and entry['hash'] == digest:
+      # Touched but unchanged.
+      entry['mtime'] = stat.st_mtime_ns
+      entry['size'] = stat.st_size
+      self._dirty = True
+      return (entry, contents)
+    # Remember the stat and hash, the caller will Update the scan results.
+    self._entries[path] = {
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': digest,
+    }
+    return (None, contents)
+
+  def Update(self, path, js_source):
+    """Record the scan of a file that Lookup reported as a miss.
+
+    Args:
+      path: str, Path to the JavaScript file.
+      js_source: The source.Source scanned from the file.
+    """
+    entry = self._entries[path]
+    entry['provides'] = sorted(js_source.provides)
+    entry['requires'] = sorted(js_source.requires)
+    entry['is_goog_module'] = js_source.is_goog_module
+    self._dirty = True
+
+  def Save(self, roots=()):
+    """Write the cache back to disk, if anything changed.
+
+    Entries for files that this run did not look up are dropped if they are
+    under one of its roots, since those files were deleted or excluded, or
+    if the file no longer exists.  Other entries are kept for other builds
+    that share the cache.
+
+    Args:
+      roots: list of str, Directories that this run scanned in full.
+    """
+    prefixes = tuple(os.path.join(os.path.normpath(root), '')
+                     for root in roots)
+    for path in list(self._entries):
+      if path not in self._used and (path.startswith(prefixes) or
+                                     not os.path.exists(path)):
+        del self._entries[path]
+        self._dirty = True
+    if not self._dirty:
+      return
+    directory = os.path.dirname(self._cache_path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    # Several builds may share a cache, so replace it atomically.
+    temp_path = '%s.%d' % (self._cache_path, os.getpid())
+    with open(temp_path, 'w') as cache_file:
+      json.dump({'version': _CACHE_VERSION, 'entries': self._entries},
+                cache_file)
+    os.replace(temp_path, self._cache_path)
+    self._dirty = False
@@ -37,6 +37,7 @@ class DepsTree(object):
 
     self._sources = sources
     self._provides_map = dict()
+    self._closures = dict()
 
     # Ensure nothing was provided twice.
     for source in sources:
@@ -66,70 +67,103 @@ class DepsTree(object):
       required_namespaces = [required_namespaces]
 
     deps_sources = []
+    seen_sources = set()
 
     for namespace in required_namespaces:
-      for source in DepsTree._ResolveDependencies(
-          namespace, [], self._provides_map, []):
-        if source not in deps_sources:
+      for source in self.GetClosure(namespace):
+        if source not in seen_sources:
+          seen_sources.add(source)
           deps_sources.append(source)
 
     return deps_sources
 
-  @staticmethod
-  def _ResolveDependencies(required_namespace, deps_list, provides_map,
-                           traversal_path):
-    """Resolve dependencies for Closure source files.
+  def GetClosure(self, required_namespace):
+    """Get source dependencies, in order, for one namespace.
 
-    Follows the dependency tree down and builds a list of sources in dependency
-    order.  This function will recursively call itself to fill all dependencies
-    below the requested namespaces, and then append its sources at the end of
-    the list.
+    Closures are memoized, so entry points that share most of their
+    dependencies only resolve each namespace once.
 
     Args:
       required_namespace: String of required namespace.
-      deps_list: List of sources in dependency order.  This function will append
-        the required source once all of its dependencies are satisfied.
-      provides_map: Map from namespace to source that provides it.
-      traversal_path: List of namespaces of our path from the root down the
-        dependency/recursion tree.  Used to identify cyclical dependencies.
-        This is a list used as a stack -- when the function is entered, the
-        current namespace is pushed and popped right before returning.
-        Each recursive call will check that the current namespace does not
-        appear in the list, throwing a CircularDependencyError if it does.
 
     Returns:
-      The given deps_list object filled with sources in dependency order.
+      A list of source objects that provide the namespace and all its
+      requirements, in dependency order.  The list is shared, do not modify.
 
     Raises:
       NamespaceNotFoundError: A namespace is requested but doesn't exist.
       CircularDependencyError: A cycle is detected in the dependency tree.
     """
+    closure = self._closures.get(required_namespace)
+    if closure is None:
+      closure = DepsTree._ResolveDependencies(required_namespace,
+                                              self._provides_map)
+      self._closures[required_namespace] = closure
+    return closure
 
-    source = provides_map.get(required_namespace)
-    if not source:
-      raise NamespaceNotFoundError(required_namespace)
-
-    if required_namespace in traversal_path:
-      traversal_path.append(required_namespace)  # do this *after* the test
-
-      # This must be a cycle.
-      raise CircularDependencyError(traversal_path)
+  @staticmethod
+  def _ResolveDependencies(required_namespace, provides_map):
+    """Resolve dependencies for Closure source files.
 
-    # If we don't have the source yet, we'll have to visit this namespace and
-    # add the required dependencies to deps_list.
-    if source not in deps_list:
-      traversal_path.append(required_namespace)
+    Follows the dependency tree down and builds a list of sources in dependency
+    order.  Each source is appended once all of its requirements have been.
+    This is a depth-first traversal, using an explicit stack rather than
+    recursion so that deep dependency chains can't exceed the recursion limit.
 
-      for require in source.requires:
+    Args:
+      required_namespace: String of required namespace.
+      provides_map: Map from namespace to source that provides it.
 
-        # Append all other dependencies before we append our own.
-        DepsTree._ResolveDependencies(require, deps_list, provides_map,
-                                      traversal_path)
-      deps_list.append(source)
+    Returns:
+      A list of sources in dependency order.
 
-      traversal_path.pop()
+    Raises:
+      NamespaceNotFoundError: A namespace is requested but doesn't exist.
+      CircularDependencyError: A cycle is detected in the dependency tree.
+    """
 
-    return deps_list
+    deps_list = []
+    deps_set = set()
+    # Namespaces of our path from the root down the dependency tree.  Used to
+    # identify cyclical dependencies.
+    traversal_path = []
+    traversal_set = set()
+    # One frame per namespace on the traversal path: the source providing it,
+    # and an iterator over the namespaces that source still has to require.
+    stack = []
+
+    namespace = required_namespace
+    while True:
+      if namespace is not None:
+        source = provides_map.get(namespace)
+        if not source:
+          raise NamespaceNotFoundError(namespace)
+
+        if namespace in traversal_set:
+          # This must be a cycle.
+          raise CircularDependencyError(traversal_path + [namespace])
+
+        # If we don't have the source yet, we'll have to visit this namespace
+        # and add the required dependencies to deps_list.
+        if source not in deps_set:
+          traversal_path.append(namespace)
+          traversal_set.add(namespace)
+          # Sorted, so the order is the same on every run.
+          stack.append((source, iter(sorted(source.requires))))
+
+      if not stack:
+        return deps_list
+
+      # Visit the next requirement of the innermost source.  Once there are
+      # none left, all other dependencies are in, so append our own.
+      source, requires = stack[-1]
+      namespace = next(requires, None)
+      if namespace is None:
+        stack.pop()
+        if source not in deps_set:
+          deps_set.add(source)
+          deps_list.append(source)
+        traversal_set.discard(traversal_path.pop())
 
 
 class BaseDepsTreeError(Exception):
@@ -58,10 +58,11 @@ def ScanTree(root, path_filter=None, ignore_hidden=True):
 
   for dirpath, dirnames, filenames in os.walk(root, onerror=OnError):
     # os.walk allows us to modify dirnames to prevent decent into particular
-    # directories.  Avoid hidden directories.
-    for dirname in dirnames:
-      if ignore_hidden and dirname.startswith('.'):
-        dirnames.remove(dirname)
+    # directories.  Avoid hidden directories.  Assign in place, removing
+    # while iterating would skip the entry after each hidden directory.
+    if ignore_hidden:
+      dirnames[:] = [dirname for dirname in dirnames
+                     if not dirname.startswith('.')]
 
     for filename in filenames:
 